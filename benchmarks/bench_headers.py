@@ -0,0 +1,98 @@
+"""
+Microbenchmark for parsing record, group and subrecord headers.
+
+Compares the per-field parsing with `Integer.parse` and friends
+to unpacking the whole header at once with the precompiled structs
+from `plugin_interface.codec`.
+
+Usage: python benchmarks/bench_headers.py [<iterations>]
+
+Requires `string_records.json` next to `plugin_interface` or in the working directory.
+"""
+
+import sys
+import timeit
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plugin_interface.codec import GROUP_HEADER, RECORD_HEADER, SUBRECORD_HEADER
+from plugin_interface.datatypes import Hex, Integer
+from plugin_interface.flags import RecordFlags
+
+RECORD = RECORD_HEADER.pack(b"WEAP", 120, 0x40000, 0x00012EB7, 0, 0, 44, 0)
+GROUP = GROUP_HEADER.pack(b"GRUP", 1024, b"WEAP", 0, 0, 0, 0)
+SUBRECORD = SUBRECORD_HEADER.pack(b"FULL", 12)
+
+
+def parse_record_fields(data: bytes):
+    stream = BytesIO(data)
+    stream.read(4).decode()
+    Integer.parse(stream, Integer.IntType.UInt32)
+    RecordFlags(Integer.parse(stream, Integer.IntType.UInt32))
+    Hex.parse(stream)
+    Integer.parse(stream, Integer.IntType.UInt16)
+    Integer.parse(stream, Integer.IntType.UInt16)
+    Integer.parse(stream, Integer.IntType.UInt16)
+    Integer.parse(stream, Integer.IntType.UInt16)
+
+
+def parse_record_struct(data: bytes):
+    type, _, flags, formid, *_ = RECORD_HEADER.unpack_from(data)
+    type.decode()
+    RecordFlags.from_value(flags)
+
+
+def parse_group_fields(data: bytes):
+    stream = BytesIO(data)
+    stream.read(4).decode()
+    Integer.parse(stream, Integer.IntType.UInt32)
+    stream.read(4).decode()
+    Integer.parse(stream, Integer.IntType.Int32)
+    Integer.parse(stream, Integer.IntType.UInt16)
+    Integer.parse(stream, Integer.IntType.UInt16)
+    Integer.parse(stream, Integer.IntType.UInt32)
+
+
+def parse_group_struct(data: bytes):
+    type, _, label, *_ = GROUP_HEADER.unpack_from(data)
+    type.decode()
+    label.decode()
+
+
+def parse_subrecord_fields(data: bytes):
+    stream = BytesIO(data)
+    stream.read(4).decode()
+    Integer.parse(stream, Integer.IntType.UInt16)
+
+
+def parse_subrecord_struct(data: bytes):
+    type, _ = SUBRECORD_HEADER.unpack_from(data)
+    type.decode()
+
+
+BENCHMARKS = {
+    "record": (parse_record_fields, parse_record_struct, RECORD),
+    "group": (parse_group_fields, parse_group_struct, GROUP),
+    "subrecord": (parse_subrecord_fields, parse_subrecord_struct, SUBRECORD),
+}
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    for name, (before, after, data) in BENCHMARKS.items():
+        before_time = timeit.timeit(lambda: before(data), number=iterations)
+        after_time = timeit.timeit(lambda: after(data), number=iterations)
+
+        print(
+            f"{name:<10}"
+            f" fields {before_time / iterations * 1e9:>7.0f} ns"
+            f"    struct {after_time / iterations * 1e9:>7.0f} ns"
+            f"    {before_time / after_time:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
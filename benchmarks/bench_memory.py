@@ -0,0 +1,70 @@
+"""
+Reports the memory footprint of parsed plugins.
+
+Usage: python benchmarks/bench_memory.py <plugin> [<plugin> ...]
+
+Requires `string_records.json` next to `plugin_interface` or in the working directory.
+The footprint is the Python heap that is still allocated after parsing,
+data of memory-mapped plugins lives in the page cache and is not included.
+"""
+
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plugin_interface import Plugin
+
+MODES: dict[str, dict] = {
+    "stream": {},
+    "zero_copy": {"zero_copy": True},
+    "memory_map": {"memory_map": True},
+    "lazy": {"memory_map": True, "lazy": True},
+    "threaded": {"threaded": True},
+}
+
+
+def measure(plugin_path: Path, options: dict) -> tuple[int, int]:
+    """
+    Returns retained and peak Python heap size when parsing `plugin_path`.
+    """
+
+    gc.collect()
+    tracemalloc.start()
+
+    plugin = Plugin(plugin_path, **options)
+    plugin.extract_strings()
+
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    plugin.close()
+
+    return retained, peak
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    for plugin_path in map(Path, sys.argv[1:]):
+        size = plugin_path.stat().st_size
+        print(f"{plugin_path.name} ({size / 1024 / 1024:.1f} MB)")
+
+        for mode, options in MODES.items():
+            retained, peak = measure(plugin_path, options)
+
+            print(
+                f"    {mode:<12}"
+                f" retained {retained / 1024 / 1024:>8.1f} MB"
+                f" ({retained / size:>5.2f}x file size)"
+                f"    peak {peak / 1024 / 1024:>8.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
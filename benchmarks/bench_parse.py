@@ -0,0 +1,105 @@
+"""
+Compares wall time and peak RSS of the different `Plugin` parsing modes
+and of extracting strings with `Plugin.scan_strings()` serially and in parallel.
+
+Usage: python benchmarks/bench_parse.py <plugin> [<plugin> ...]
+
+Requires `string_records.json` next to `plugin_interface` or in the working directory.
+Every mode runs in a fresh process so that peak RSS is measured
+independently for each of them. Peak RSS of parallel scanning does not include
+its worker processes.
+"""
+
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plugin_interface import Plugin
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+MODES: dict[str, dict] = {
+    "stream": {},
+    "zero_copy": {"zero_copy": True},
+    "memory_map": {"memory_map": True},
+    "lazy": {"memory_map": True, "lazy": True},
+    "threaded": {"threaded": True},
+}
+
+SCAN_MODES: dict[str, dict] = {
+    "scan": {},
+    "scan_parallel": {"parallel": True},
+}
+
+
+def get_peak_rss() -> int | None:
+    """
+    Returns peak resident set size of the current process in bytes.
+    """
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_mode(plugin_path: Path, options: dict) -> tuple[float, int | None]:
+    start = time.perf_counter()
+    Plugin(plugin_path, **options)
+    duration = time.perf_counter() - start
+
+    return duration, get_peak_rss()
+
+
+def run_scan_mode(plugin_path: Path, options: dict) -> tuple[float, int | None]:
+    start = time.perf_counter()
+    list(Plugin.scan_strings(plugin_path, **options))
+    duration = time.perf_counter() - start
+
+    return duration, get_peak_rss()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    context = multiprocessing.get_context("spawn")
+
+    for plugin_path in map(Path, sys.argv[1:]):
+        size = plugin_path.stat().st_size
+        print(f"{plugin_path.name} ({size / 1024 / 1024:.1f} MB)")
+
+        modes = [(mode, options, run_mode) for mode, options in MODES.items()]
+        modes += [
+            (mode, options, run_scan_mode) for mode, options in SCAN_MODES.items()
+        ]
+
+        for mode, options, function in modes:
+            # Pool processes are daemonic and could not start the scan workers
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                duration, peak_rss = executor.submit(
+                    function, plugin_path, options
+                ).result()
+
+            rss = f"{peak_rss / 1024 / 1024:.1f} MB" if peak_rss else "n/a"
+            print(
+                f"    {mode:<14} {duration:>8.2f} s"
+                f" {size / duration / 1024 / 1024:>8.1f} MB/s"
+                f"    peak RSS {rss}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark for decoding null-terminated strings with `RawString.parse`.
+
+Compares the previous byte-by-byte decoding with the current implementation
+on a synthetic corpus of long book texts.
+
+Usage: python benchmarks/bench_strings.py [<number of books>]
+
+Requires `string_records.json` next to `plugin_interface` or in the working directory.
+"""
+
+import random
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plugin_interface.datatypes import RawString
+
+WORDS = [
+    "the", "dragon", "of", "Skyrim", "ancient", "Nords", "sword", "shout",
+    "Whiterun", "Jarl", "guard", "arrow", "knee", "Dwemer", "ruins", "Thu'um",
+]  # fmt: skip
+
+
+def build_corpus(count: int) -> list[bytes]:
+    """
+    Creates `count` deterministic book texts between 1 KB and 16 KB.
+    """
+
+    rng = random.Random(0)
+    corpus: list[bytes] = []
+
+    for _ in range(count):
+        length = rng.randrange(1024, 16 * 1024)
+        text = ""
+        while len(text) < length:
+            text += " ".join(rng.choices(WORDS, k=12)).capitalize() + ".\n"
+
+        corpus.append(text.encode() + b"\x00")
+
+    return corpus
+
+
+def parse_bytewise(data: bytes) -> RawString:
+    """
+    Previous implementation of `RawString.parse` for `StrType.ZString`.
+    """
+
+    stream = BytesIO(data)
+    string = b""
+    while (char := stream.read(1)) != b"\x00" and char:
+        string += char
+
+    return RawString.decode(string)
+
+
+def parse_current(data: bytes) -> RawString:
+    return RawString.parse(data, RawString.StrType.ZString)
+
+
+def measure(function, corpus: list[bytes]) -> float:
+    start = time.perf_counter()
+
+    for data in corpus:
+        function(data)
+
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    corpus = build_corpus(count)
+    size = sum(map(len, corpus)) / 1024 / 1024
+
+    print(f"{count} books ({size:.1f} MB)")
+
+    for name, function in [("bytewise", parse_bytewise), ("current", parse_current)]:
+        duration = measure(function, corpus)
+        print(f"    {name:<10} {duration:>8.3f} s {size / duration:>10.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
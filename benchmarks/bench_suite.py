@@ -0,0 +1,310 @@
+"""
+Benchmark suite for parsing, extracting, replacing and writing plugins.
+
+Generates a synthetic plugin for every shape in `generate_plugin.SHAPES`
+and measures throughput and peak RSS of `Plugin` parsing, `extract_strings()`,
+`replace_strings()`, `dump()` and `save()` in every parsing mode of `MODES`
+and of `Plugin.scan_strings()` in every mode of `SCAN_MODES`.
+Every benchmark runs in a fresh process so that peak RSS is measured
+independently for each of them. Peak RSS of parallel scanning does not include
+its worker processes.
+
+The results are written as JSON to `benchmarks/results/<commit>.json`,
+if a previous result file is passed, the changes against it are reported.
+
+Usage: python benchmarks/bench_suite.py [<scale>] [<baseline.json>]
+
+Requires `string_records.json` next to `plugin_interface` or in the working directory.
+"""
+
+import json
+import multiprocessing
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_plugin import SHAPES, generate_plugin
+
+from plugin_interface import Plugin
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPEATS = 3
+"""
+Number of runs per benchmark, the fastest one is reported.
+"""
+
+RESULTS_PATH = Path(__file__).resolve().parent / "results"
+
+MODES: dict[str, dict] = {
+    "stream": {},
+    "zero_copy": {"zero_copy": True},
+    "memory_map": {"memory_map": True},
+    "lazy": {"memory_map": True, "lazy": True},
+    "threaded": {"threaded": True},
+}
+"""
+Options of `Plugin` for every parsing mode.
+"""
+
+SCAN_MODES: dict[str, dict] = {
+    "serial": {},
+    "parallel": {"parallel": True},
+}
+"""
+Options of `Plugin.scan_strings()` for every scanning mode.
+"""
+
+
+def get_peak_rss() -> int | None:
+    """
+    Returns peak resident set size of the current process in bytes.
+    """
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def get_commit() -> str:
+    """
+    Returns the abbreviated hash of the checked out commit.
+    """
+
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return process.stdout.strip()
+
+
+def translate(plugin: Plugin):
+    """
+    Returns the strings of `plugin` with translations that change their lengths.
+    """
+
+    strings = plugin.extract_strings()
+
+    for string in strings:
+        string.translated_string = f"[{string.original_string}]"
+
+    return strings
+
+
+def bench_parse(
+    plugin_path: Path, output_path: Path, options: dict
+) -> tuple[float, int, None]:
+    start = time.perf_counter()
+    Plugin(plugin_path, **options)
+    duration = time.perf_counter() - start
+
+    return duration, plugin_path.stat().st_size, None
+
+
+def bench_extract_strings(
+    plugin_path: Path, output_path: Path, options: dict
+) -> tuple[float, int, int]:
+    plugin = Plugin(plugin_path, **options)
+
+    start = time.perf_counter()
+    strings = plugin.extract_strings()
+    duration = time.perf_counter() - start
+
+    return duration, plugin_path.stat().st_size, len(strings)
+
+
+def bench_replace_strings(
+    plugin_path: Path, output_path: Path, options: dict
+) -> tuple[float, int, int]:
+    plugin = Plugin(plugin_path, **options)
+    strings = translate(plugin)
+
+    start = time.perf_counter()
+    plugin.replace_strings(strings)
+    duration = time.perf_counter() - start
+
+    return duration, plugin_path.stat().st_size, len(strings)
+
+
+def bench_dump(
+    plugin_path: Path, output_path: Path, options: dict
+) -> tuple[float, int, None]:
+    plugin = Plugin(plugin_path, **options)
+    strings = translate(plugin)
+    plugin.replace_strings(strings)
+
+    start = time.perf_counter()
+    data = plugin.dump()
+    duration = time.perf_counter() - start
+
+    return duration, len(data), None
+
+
+def bench_save(
+    plugin_path: Path, output_path: Path, options: dict
+) -> tuple[float, int, None]:
+    # `Plugin.save()` overwrites the plugin, so a copy is saved instead
+    shutil.copyfile(plugin_path, output_path)
+
+    plugin = Plugin(output_path, **options)
+    strings = translate(plugin)
+    plugin.replace_strings(strings)
+
+    start = time.perf_counter()
+    plugin.save()
+    duration = time.perf_counter() - start
+
+    plugin.close()
+
+    return duration, output_path.stat().st_size, None
+
+
+def bench_scan_strings(
+    plugin_path: Path, output_path: Path, options: dict
+) -> tuple[float, int, int]:
+    start = time.perf_counter()
+    strings = list(Plugin.scan_strings(plugin_path, **options))
+    duration = time.perf_counter() - start
+
+    return duration, plugin_path.stat().st_size, len(strings)
+
+
+BENCHMARKS = {
+    # Every benchmark returns its duration, the number of processed bytes
+    # and the number of processed strings, if it processes strings,
+    # and runs in every mode of its modes
+    "parse": (bench_parse, MODES),
+    "extract_strings": (bench_extract_strings, MODES),
+    "replace_strings": (bench_replace_strings, MODES),
+    "dump": (bench_dump, MODES),
+    "save": (bench_save, MODES),
+    "scan_strings": (bench_scan_strings, SCAN_MODES),
+}
+
+
+def run_benchmark(name: str, mode: str, plugin_path: Path, output_path: Path) -> dict:
+    """
+    Runs benchmark `name` in `mode` `REPEATS` times and returns its fastest run.
+    """
+
+    function, modes = BENCHMARKS[name]
+    duration = float("inf")
+
+    for _ in range(REPEATS):
+        run_duration, size, strings = function(plugin_path, output_path, modes[mode])
+        duration = min(duration, run_duration)
+
+    return {
+        "seconds": duration,
+        "mb_per_s": size / duration / 1024 / 1024,
+        "strings_per_s": strings / duration if strings is not None else None,
+        "peak_rss": get_peak_rss(),
+    }
+
+
+def format_change(result: dict, previous_result: dict | None) -> str:
+    """
+    Returns the change of the duration of `result` against `previous_result`.
+    """
+
+    if previous_result is None:
+        return ""
+
+    change = result["seconds"] / previous_result["seconds"] - 1
+
+    return f" ({change * 100:+6.1f} %)"
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline: dict = {}
+
+    if len(sys.argv) > 2:
+        baseline = json.loads(Path(sys.argv[2]).read_text())["shapes"]
+
+    context = multiprocessing.get_context("spawn")
+    results: dict[str, dict] = {}
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        for shape_name, shape in SHAPES.items():
+            plugin_path = generate_plugin(
+                Path(temp_folder) / f"{shape_name}.esp", shape, scale
+            )
+            output_path = Path(temp_folder) / f"{shape_name}_output.esp"
+            size = plugin_path.stat().st_size
+
+            print(f"{shape_name} ({size / 1024 / 1024:.1f} MB)")
+
+            # Results of every benchmark per mode
+            benchmarks: dict[str, dict[str, dict]] = {}
+
+            for name, (_, modes) in BENCHMARKS.items():
+                benchmarks[name] = {}
+                previous_results: dict = (
+                    baseline.get(shape_name, {}).get("benchmarks", {}).get(name, {})
+                )
+
+                for mode in modes:
+                    # Pool processes are daemonic and could not start the scan workers
+                    with ProcessPoolExecutor(1, mp_context=context) as executor:
+                        result = executor.submit(
+                            run_benchmark, name, mode, plugin_path, output_path
+                        ).result()
+
+                    benchmarks[name][mode] = result
+
+                    rss = result["peak_rss"]
+                    rss = f"{rss / 1024 / 1024:.1f} MB" if rss else "n/a"
+                    strings_per_s = result["strings_per_s"]
+                    strings_per_s = f"{strings_per_s:.0f}" if strings_per_s else "n/a"
+                    print(
+                        f"    {name:<16} {mode:<11} {result['seconds']:>8.3f} s"
+                        f"{format_change(result, previous_results.get(mode))}"
+                        f" {result['mb_per_s']:>8.1f} MB/s"
+                        f" {strings_per_s:>10} strings/s"
+                        f"    peak RSS {rss}"
+                    )
+
+            results[shape_name] = {"size": size, "benchmarks": benchmarks}
+
+    commit = get_commit()
+    output = {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "shapes": results,
+    }
+
+    RESULTS_PATH.mkdir(exist_ok=True)
+    results_path = RESULTS_PATH / f"{commit}.json"
+    results_path.write_text(json.dumps(output, indent=4))
+
+    print(f"Results written to {results_path}.")
+
+
+if __name__ == "__main__":
+    main()
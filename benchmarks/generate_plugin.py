@@ -0,0 +1,476 @@
+"""
+Deterministic generator for synthetic plugins.
+
+Real Bethesda masters cannot be redistributed, so benchmarks run on plugins
+that are generated from a `PluginShape` describing their size and structure.
+The same shape, scale and seed always produce the same bytes.
+
+Usage: python benchmarks/generate_plugin.py <output> [<shape>] [<scale>]
+
+<shape> is one of the presets in `SHAPES` and defaults to "mixed".
+"""
+
+import random
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from plugin_interface.codec import (
+    GROUP_HEADER,
+    RECORD_HEADER,
+    SUBRECORD_HEADER,
+    UINT32,
+)
+from plugin_interface.flags import RecordFlags
+
+WORDS = [
+    "the", "dragon", "of", "Skyrim", "ancient", "Nords", "sword", "shout",
+    "Whiterun", "Jarl", "guard", "arrow", "knee", "Dwemer", "ruins", "Thu'um",
+]  # fmt: skip
+
+LEGACY_WORDS = ["Café", "Jötunn", "Señor", "Élan", "Größe", "Déjà"]
+"""
+Words with characters that are encoded differently in legacy encodings.
+"""
+
+
+@dataclass
+class PluginShape:
+    """
+    Size and structure of a synthetic plugin.
+
+    Record counts are multiplied by the scale the plugin is generated with.
+    """
+
+    weapons: int = 20
+    books: int = 5
+    book_words: int = 800
+    """
+    Number of words in the text of every book.
+    """
+
+    quests: int = 3
+    topics: int = 10
+    responses: int = 3
+    """
+    Number of INFO records per topic.
+    """
+
+    perks: int = 5
+    messages: int = 3
+    interior_cells: int = 4
+    exterior_cells: int = 4
+    references: int = 20
+    """
+    Number of references per cell.
+    """
+
+    compressed_ratio: float = 0.5
+    """
+    Fraction of records that are stored compressed.
+    """
+
+    legacy_ratio: float = 0.25
+    """
+    Fraction of names that are encoded with `legacy_encoding` instead of UTF-8.
+    """
+
+    legacy_encoding: str = "cp1252"
+    seed: int = 0
+
+
+SHAPES: dict[str, PluginShape] = {
+    "mixed": PluginShape(),
+    "books": PluginShape(
+        weapons=0,
+        books=40,
+        book_words=3000,
+        quests=0,
+        topics=0,
+        perks=0,
+        messages=0,
+        interior_cells=0,
+        exterior_cells=0,
+    ),
+    "dialogue": PluginShape(
+        weapons=0,
+        books=0,
+        quests=20,
+        topics=100,
+        responses=5,
+        perks=10,
+        messages=20,
+        interior_cells=0,
+        exterior_cells=0,
+    ),
+    "worldspace": PluginShape(
+        weapons=0,
+        books=0,
+        quests=0,
+        topics=0,
+        perks=0,
+        messages=0,
+        interior_cells=20,
+        exterior_cells=60,
+        references=40,
+        compressed_ratio=1.0,
+    ),
+}
+
+
+class PluginGenerator:
+    """
+    Generates the bytes of a synthetic plugin with a specific shape.
+    """
+
+    CELLS_PER_BLOCK = 8
+    FIRST_FORMID = 0x01000800
+
+    def __init__(self, shape: PluginShape, scale: int = 1):
+        self.shape = shape
+        self.scale = scale
+        self.rng = random.Random(shape.seed)
+        self.next_formid = self.FIRST_FORMID
+
+    def count(self, number: int) -> int:
+        return number * self.scale
+
+    def get_formid(self) -> int:
+        formid = self.next_formid
+        self.next_formid += 1
+
+        return formid
+
+    def words(self, count: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=count)).capitalize() + "."
+
+    def zstring(self, text: str, encoding: str = "utf8") -> bytes:
+        return text.encode(encoding) + b"\x00"
+
+    def name(self, count: int) -> bytes:
+        """
+        Returns a name with `count` words that is encoded in the legacy encoding
+        for a fraction of `PluginShape.legacy_ratio` of all names.
+        """
+
+        if self.rng.random() < self.shape.legacy_ratio:
+            text = f"{self.rng.choice(LEGACY_WORDS)} {self.words(count - 1)}"
+            return self.zstring(text, self.shape.legacy_encoding)
+
+        return self.zstring(self.words(count))
+
+    def random_bytes(self, size: int) -> bytes:
+        # Few distinct values so that compressed records actually shrink
+        return bytes(self.rng.choices(range(16), k=size))
+
+    @staticmethod
+    def subrecord(type: str, data: bytes) -> bytes:
+        return SUBRECORD_HEADER.pack(type.encode(), len(data)) + data
+
+    def record(
+        self,
+        type: str,
+        subrecords: list[bytes],
+        formid: int = None,
+        compressible: bool = True,
+    ) -> bytes:
+        data = b"".join(subrecords)
+        flags = 0
+
+        if formid is None:
+            formid = self.get_formid()
+
+        if compressible and self.rng.random() < self.shape.compressed_ratio:
+            flags |= RecordFlags.Compressed.value
+            data = UINT32.pack(len(data)) + zlib.compress(data)
+
+        header = RECORD_HEADER.pack(
+            type.encode(), len(data), flags, formid, 0, 0, 44, 0
+        )
+
+        return header + data
+
+    @staticmethod
+    def group(label: bytes, group_type: int, children: list[bytes]) -> bytes:
+        data = b"".join(children)
+        header = GROUP_HEADER.pack(
+            b"GRUP", GROUP_HEADER.size + len(data), label, group_type, 0, 0, 0
+        )
+
+        return header + data
+
+    def header(self) -> bytes:
+        subrecords = [
+            self.subrecord("HEDR", struct.pack("<fII", 1.71, 0, self.FIRST_FORMID)),
+            self.subrecord("CNAM", self.zstring("PluginGenerator")),
+            self.subrecord("MAST", self.zstring("Skyrim.esm")),
+            self.subrecord("DATA", bytes(8)),
+        ]
+
+        return self.record("TES4", subrecords, formid=0, compressible=False)
+
+    def weapons(self) -> bytes:
+        records: list[bytes] = []
+
+        for i in range(self.count(self.shape.weapons)):
+            # Every third weapon overrides a record of the master
+            formid = 0x00012EB7 + i if i % 3 == 0 else None
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenWeapon{i}")),
+                self.subrecord("FULL", self.name(3)),
+                self.subrecord("DESC", self.zstring(self.words(12))),
+                self.subrecord("DATA", self.random_bytes(10)),
+            ]
+            records.append(self.record("WEAP", subrecords, formid))
+
+        return self.group(b"WEAP", 0, records)
+
+    def books(self) -> bytes:
+        records: list[bytes] = []
+
+        for i in range(self.count(self.shape.books)):
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenBook{i}")),
+                self.subrecord("FULL", self.name(3)),
+                self.subrecord("DESC", self.zstring(self.words(self.shape.book_words))),
+                self.subrecord("DATA", self.random_bytes(16)),
+            ]
+            records.append(self.record("BOOK", subrecords))
+
+        return self.group(b"BOOK", 0, records)
+
+    def quests(self) -> bytes:
+        records: list[bytes] = []
+
+        for i in range(self.count(self.shape.quests)):
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenQuest{i}")),
+                self.subrecord("FULL", self.name(3)),
+            ]
+
+            for stage in range(3):
+                subrecords += [
+                    self.subrecord("INDX", struct.pack("<hBB", stage * 10, 0, 0)),
+                    self.subrecord("QSDT", b"\x00"),
+                    self.subrecord("CTDA", self.random_bytes(32)),
+                    self.subrecord("CNAM", self.zstring(self.words(20))),
+                ]
+
+            for objective in range(2):
+                subrecords += [
+                    self.subrecord("QOBJ", struct.pack("<h", objective * 10)),
+                    self.subrecord("FNAM", bytes(4)),
+                    self.subrecord("NNAM", self.zstring(self.words(6))),
+                ]
+
+            records.append(self.record("QUST", subrecords))
+
+        return self.group(b"QUST", 0, records)
+
+    def topics(self) -> bytes:
+        children: list[bytes] = []
+
+        for i in range(self.count(self.shape.topics)):
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenTopic{i}")),
+                self.subrecord("FULL", self.name(4)),
+            ]
+            topic_formid = self.next_formid
+            children.append(self.record("DIAL", subrecords))
+
+            responses: list[bytes] = []
+            for response in range(self.shape.responses):
+                trdt = struct.pack("<IIi", 0, 50, 0) + bytes([response + 1]) + bytes(11)
+                subrecords = [
+                    self.subrecord("TRDT", trdt),
+                    self.subrecord("NAM1", self.zstring(self.words(15))),
+                    self.subrecord("RNAM", self.zstring(self.words(2))),
+                ]
+                responses.append(self.record("INFO", subrecords))
+
+            children.append(self.group(UINT32.pack(topic_formid), 7, responses))
+
+        return self.group(b"DIAL", 0, children)
+
+    def perks(self) -> bytes:
+        records: list[bytes] = []
+
+        for i in range(self.count(self.shape.perks)):
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenPerk{i}")),
+                self.subrecord("FULL", self.name(2)),
+                self.subrecord("DESC", self.zstring(self.words(10))),
+                self.subrecord("PRKE", bytes(3)),
+                self.subrecord("EPFT", b"\x04"),
+                self.subrecord("EPF2", self.zstring(self.words(1))),
+                self.subrecord("EPF3", struct.pack("<HH", 0, i)),
+                self.subrecord("PRKF", b""),
+                self.subrecord("PRKE", bytes(3)),
+                self.subrecord("EPFT", b"\x07"),
+                self.subrecord("EPFD", self.zstring(self.words(2))),
+                self.subrecord("PRKF", b""),
+            ]
+            records.append(self.record("PERK", subrecords))
+
+        return self.group(b"PERK", 0, records)
+
+    def messages(self) -> bytes:
+        records: list[bytes] = []
+
+        for i in range(self.count(self.shape.messages)):
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenMessage{i}")),
+                self.subrecord("DESC", self.zstring(self.words(15))),
+                self.subrecord("FULL", self.name(2)),
+                self.subrecord("ITXT", self.zstring("Yes")),
+                self.subrecord("ITXT", self.zstring("No")),
+            ]
+            records.append(self.record("MESG", subrecords))
+
+        return self.group(b"MESG", 0, records)
+
+    def references(self) -> list[bytes]:
+        return [
+            self.record(
+                "REFR",
+                [
+                    self.subrecord("NAME", bytes(4)),
+                    self.subrecord("DATA", self.random_bytes(24)),
+                ],
+            )
+            for _ in range(self.shape.references)
+        ]
+
+    def cell(self, interior: bool, index: int) -> list[bytes]:
+        """
+        Returns a CELL record and the group of its children.
+        """
+
+        if interior:
+            subrecords = [
+                self.subrecord("EDID", self.zstring(f"GenCell{index}")),
+                self.subrecord("FULL", self.name(2)),
+                self.subrecord("DATA", b"\x01\x00"),
+            ]
+            large_record = self.record(
+                "NAVM", [self.subrecord("NVNM", self.random_bytes(2000))]
+            )
+        else:
+            subrecords = [
+                self.subrecord("DATA", b"\x00\x00"),
+                self.subrecord("XCLC", struct.pack("<ii", index, 0) + bytes(4)),
+            ]
+            large_record = self.record(
+                "LAND", [self.subrecord("VHGT", self.random_bytes(3000))]
+            )
+
+        cell_formid = self.next_formid
+        cell = self.record("CELL", subrecords)
+        references = self.references()
+        label = UINT32.pack(cell_formid)
+
+        persistent = self.group(label, 8, references[: len(references) // 4])
+        temporary = self.group(
+            label, 9, references[len(references) // 4 :] + [large_record]
+        )
+
+        return [cell, self.group(label, 6, [persistent, temporary])]
+
+    def blocks(
+        self, cells: list[list[bytes]], block_type: int, subblock_type: int
+    ) -> list[bytes]:
+        """
+        Groups `cells` into blocks with a single subblock each.
+        """
+
+        blocks: list[bytes] = []
+
+        for start in range(0, len(cells), self.CELLS_PER_BLOCK):
+            block = start // self.CELLS_PER_BLOCK
+            label = (
+                struct.pack("<hh", block, 0)
+                if block_type == 4
+                else struct.pack("<i", block)
+            )
+            children = [
+                data
+                for cell in cells[start : start + self.CELLS_PER_BLOCK]
+                for data in cell
+            ]
+            subblock = self.group(label, subblock_type, children)
+            blocks.append(self.group(label, block_type, [subblock]))
+
+        return blocks
+
+    def interior_cells(self) -> bytes:
+        cells = [
+            self.cell(True, i) for i in range(self.count(self.shape.interior_cells))
+        ]
+
+        return self.group(b"CELL", 0, self.blocks(cells, 2, 3))
+
+    def worldspaces(self) -> bytes:
+        subrecords = [
+            self.subrecord("EDID", self.zstring("GenWorld")),
+            self.subrecord("FULL", self.name(2)),
+        ]
+        world_formid = self.next_formid
+        world = self.record("WRLD", subrecords)
+
+        cells = [
+            self.cell(False, i) for i in range(self.count(self.shape.exterior_cells))
+        ]
+        children = self.group(UINT32.pack(world_formid), 1, self.blocks(cells, 4, 5))
+
+        return self.group(b"WRLD", 0, [world, children])
+
+    def generate(self) -> bytes:
+        parts = [self.header()]
+        groups = [
+            (self.shape.weapons, self.weapons),
+            (self.shape.books, self.books),
+            (self.shape.quests, self.quests),
+            (self.shape.topics, self.topics),
+            (self.shape.perks, self.perks),
+            (self.shape.messages, self.messages),
+            (self.shape.interior_cells, self.interior_cells),
+            (self.shape.exterior_cells, self.worldspaces),
+        ]
+
+        for count, generate_group in groups:
+            if count:
+                parts.append(generate_group())
+
+        return b"".join(parts)
+
+
+def generate_plugin(path: Path, shape: PluginShape, scale: int = 1) -> Path:
+    """
+    Writes a synthetic plugin with `shape` and `scale` to `path`.
+    """
+
+    path.write_bytes(PluginGenerator(shape, scale).generate())
+
+    return path
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    path = Path(sys.argv[1])
+    shape = sys.argv[2] if len(sys.argv) > 2 else "mixed"
+    scale = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    generate_plugin(path, SHAPES[shape], scale)
+
+    print(f"{path.name} ({path.stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
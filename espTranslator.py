@@ -42,6 +42,11 @@ log_handler.setFormatter(formatter)
 root_logger.addHandler(log_handler)
 log = logging.getLogger("Converter")
 
+# Sidecar cache for strings extracted from unchanged plugins.
+CACHE_DIR = Path(os.getenv("ESP_TRANSLATOR_CACHE_DIR", ".plugin_cache"))
+CACHE_MAX_SIZE = int(os.getenv("ESP_TRANSLATOR_CACHE_MAX_SIZE", 256 * 1024 * 1024))  # bytes
+CACHE_MAX_AGE = float(os.getenv("ESP_TRANSLATOR_CACHE_MAX_AGE", 30 * 24 * 60 * 60))  # seconds
+
 # Set API key.
 openai.api_key = os.getenv("OPENAI_API_KEY")
 if not openai.api_key:
@@ -210,18 +215,19 @@ async def async_translate_in_batches(strings_to_translate: list[str], batch_size
         final_translations.extend(translations)
     return final_translations
 
-async def async_process_plugin_file(plugin_path: Path, output_path: Path, term_automaton: ahocorasick.Automaton) -> None:
+async def async_process_plugin_file(plugin_path: Path, output_path: Path, term_automaton: ahocorasick.Automaton, plugin_cache=None) -> None:
     file_start = time.perf_counter()
     log.info(f"Processing {plugin_path}...")
     try:
         from plugin_interface import Plugin  # import local plugin interface
-        plugin = Plugin(plugin_path)
-    except Exception as e:
-        log.error(f"Error loading plugin {plugin_path}: {e}")
-        return
-
-    try:
-        extracted_strings = plugin.extract_strings()
+        extracted_strings = plugin_cache.get(plugin_path) if plugin_cache else None
+        if extracted_strings is None:
+            # Only parse records that can contain strings instead of the whole plugin.
+            extracted_strings = list(Plugin.scan_strings(plugin_path))
+            if plugin_cache:
+                plugin_cache.put(plugin_path, extracted_strings)
+        else:
+            log.info(f"Loaded strings of unchanged plugin {plugin_path} from cache.")
     except Exception as e:
         log.error(f"Error extracting strings from {plugin_path}: {e}")
         return
@@ -287,13 +293,17 @@ async def async_main() -> None:
         log.warning("No .esp files found in the immediate subfolders of the provided directory.")
         sys.exit(0)
 
+    from plugin_interface.cache import PluginCache  # import local plugin interface
+    plugin_cache = PluginCache(CACHE_DIR, max_size=CACHE_MAX_SIZE, max_age=CACHE_MAX_AGE)
+
     total_start = time.perf_counter()
     tasks = []
     for esp_file in esp_files:
         relative_path = esp_file.relative_to(mods_root)
         output_file = output_root / relative_path.parent / f"{esp_file.stem}_output{esp_file.suffix}.json"
-        tasks.append(async_process_plugin_file(esp_file, output_file, term_automaton))
+        tasks.append(async_process_plugin_file(esp_file, output_file, term_automaton, plugin_cache))
     await asyncio.gather(*tasks)
+    plugin_cache.evict()
     total_end = time.perf_counter()
     log.info(f"Total processing time for all files: {total_end - total_start:.2f} seconds.")
 
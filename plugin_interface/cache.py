@@ -0,0 +1,219 @@
+"""
+Copyright (c) Cutleast
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import time
+import zlib
+from pathlib import Path
+
+from .plugin_string import PluginString
+from .record import STRING_INDEX_VERSION
+from .utilities import STRING_FILTER_VERSION, WHITELIST_DIGEST
+
+
+class PluginCache:
+    """
+    Persistent cache for strings extracted from plugins.
+
+    Every plugin gets an entry file in the cache directory that stores
+    its size, modification time and content hash together with the extracted
+    strings, so plugins that did not change since the last run need not be parsed.
+    Entries are also invalidated if the whitelist of string subrecords
+    or the string filter changed.
+
+    Only the strings are cached. Writing translations back still requires
+    the parsed plugin since the strings are replaced in its subrecords,
+    which are found by the form id, type, index and text of the cached strings.
+    """
+
+    VERSION = 2
+    """
+    Version of the entry format, entries of other versions are ignored.
+    """
+
+    cache_dir: Path
+
+    max_size: int | None
+    """
+    Maximum total size of all entries in bytes.
+    Least recently used entries are evicted if it is exceeded.
+    """
+
+    max_age: float | None
+    """
+    Maximum time in seconds since an entry was last used before it is evicted.
+    """
+
+    log = logging.getLogger("PluginInterface.Cache")
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        max_size: int | None = 256 * 1024 * 1024,
+        max_age: float | None = 30 * 24 * 60 * 60,
+    ):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_entry_path(self, plugin_path: Path) -> Path:
+        path_hash = hashlib.sha1(str(plugin_path.resolve()).encode()).hexdigest()
+
+        return self.cache_dir / f"{path_hash}.cache"
+
+    @staticmethod
+    def get_content_hash(plugin_path: Path) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+
+        with plugin_path.open("rb") as file:
+            while chunk := file.read(1024 * 1024):
+                digest.update(chunk)
+
+        return digest.hexdigest()
+
+    def load_entry(self, entry_path: Path) -> dict | None:
+        try:
+            entry: dict = pickle.loads(zlib.decompress(entry_path.read_bytes()))
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            self.log.warning(f"Failed to load cache entry {entry_path.name!r}: {ex}")
+            return None
+
+        if entry.get("version") != PluginCache.VERSION:
+            return None
+
+        # Strings with indices of another scheme would not be found in the plugin
+        if entry.get("index_version") != STRING_INDEX_VERSION:
+            return None
+
+        # Other strings would be extracted with another whitelist or filter
+        if (
+            entry.get("whitelist") != WHITELIST_DIGEST
+            or entry.get("filter_version") != STRING_FILTER_VERSION
+        ):
+            return None
+
+        return entry
+
+    def get(self, plugin_path: Path) -> list[PluginString] | None:
+        """
+        Returns cached strings of `plugin_path` or None if the plugin is not cached
+        or changed since it was cached.
+        """
+
+        entry_path = self.get_entry_path(plugin_path)
+        entry = self.load_entry(entry_path)
+
+        if entry is None:
+            return None
+
+        stat = plugin_path.stat()
+
+        if entry["size"] != stat.st_size:
+            return None
+
+        # Only hash the content if the plugin was touched
+        if entry["mtime"] != stat.st_mtime_ns:
+            if entry["hash"] != self.get_content_hash(plugin_path):
+                return None
+
+            entry["mtime"] = stat.st_mtime_ns
+            self.write_entry(entry_path, entry)
+
+        # Mark entry as recently used
+        os.utime(entry_path)
+
+        return [
+            PluginString(
+                editor_id,
+                form_id,
+                index,
+                type,
+                original_string,
+                status=PluginString.Status[status] if status else None,
+            )
+            for editor_id, form_id, index, type, original_string, status in entry[
+                "strings"
+            ]
+        ]
+
+    def put(self, plugin_path: Path, strings: list[PluginString]):
+        """
+        Caches `strings` extracted from `plugin_path`.
+
+        Entries are not evicted here, `evict()` has to be called once per run.
+        """
+
+        stat = plugin_path.stat()
+
+        entry = {
+            "version": PluginCache.VERSION,
+            "index_version": STRING_INDEX_VERSION,
+            "whitelist": WHITELIST_DIGEST,
+            "filter_version": STRING_FILTER_VERSION,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": self.get_content_hash(plugin_path),
+            "strings": [
+                (
+                    string.editor_id,
+                    string.form_id,
+                    string.index,
+                    string.type,
+                    string.original_string,
+                    string.status.name if string.status else None,
+                )
+                for string in strings
+            ],
+        }
+
+        self.write_entry(self.get_entry_path(plugin_path), entry)
+
+    def write_entry(self, entry_path: Path, entry: dict):
+        data = zlib.compress(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+
+        # Write to temporary file first so that no partial entries are read
+        temp_path = entry_path.with_name(entry_path.name + ".tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, entry_path)
+
+    def evict(self):
+        """
+        Removes entries that are too old and least recently used entries
+        until the cache does not exceed `max_size`.
+
+        This stats all entries, so it should be called once after all plugins
+        of a run are processed instead of after every `put()`.
+        """
+
+        entries = [(path, path.stat()) for path in self.cache_dir.glob("*.cache")]
+        entries.sort(key=lambda entry: entry[1].st_mtime)
+
+        now = time.time()
+        total_size = sum(stat.st_size for _, stat in entries)
+
+        for path, stat in entries:
+            too_old = self.max_age is not None and now - stat.st_mtime > self.max_age
+            too_large = self.max_size is not None and total_size > self.max_size
+
+            if not too_old and not too_large:
+                continue
+
+            path.unlink(missing_ok=True)
+            total_size -= stat.st_size
+            self.log.debug(f"Evicted cache entry {path.name!r}.")
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+
+        for path in self.cache_dir.glob("*.cache"):
+            path.unlink(missing_ok=True)
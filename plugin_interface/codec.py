@@ -0,0 +1,37 @@
+"""
+Copyright (c) Cutleast
+"""
+
+import struct
+
+RECORD_HEADER = struct.Struct("<4sIIIHHHH")
+"""
+Record header: type, size, flags, formid, timestamp,
+version control info, internal version and unknown.
+"""
+
+GROUP_HEADER = struct.Struct("<4sI4siHHI")
+"""
+Group header: type, group size, label, group type, timestamp,
+version control info and unknown.
+"""
+
+SUBRECORD_HEADER = struct.Struct("<4sH")
+"""
+Subrecord header: type and size.
+"""
+
+UINT32 = struct.Struct("<I")
+"""
+Size prefix of compressed record payloads and of strings in .DLSTRINGS and .ILSTRINGS.
+"""
+
+STRING_TABLE_HEADER = struct.Struct("<II")
+"""
+String table header: number of strings and size of the string data.
+"""
+
+STRING_TABLE_ENTRY = struct.Struct("<II")
+"""
+String table directory entry: string id and offset relative to the string data.
+"""
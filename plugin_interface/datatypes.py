@@ -7,7 +7,7 @@ import struct
 from enum import Enum, auto
 from io import BufferedReader
 
-from .utilities import get_stream, read_data
+from .utilities import get_stream, peek, read_data, read_zstring
 
 
 class Integer:
@@ -41,12 +41,17 @@ class Integer:
         """Signed Integer of Size 8."""
 
     @staticmethod
-    def parse(data: BufferedReader | bytes, type: IntType | tuple[int, bool]):
+    def parse(
+        data: BufferedReader | bytes | memoryview, type: IntType | tuple[int, bool]
+    ):
         if isinstance(type, Integer.IntType):
             size, signed = type.value
         else:
             size, signed = type
 
+        if isinstance(data, (bytes, memoryview)):
+            return int.from_bytes(data[:size], byteorder="little", signed=signed)
+
         return int.from_bytes(
             get_stream(data).read(size), byteorder="little", signed=signed
         )
@@ -80,7 +85,7 @@ class Float:
         """Alias for Float64."""
 
     @staticmethod
-    def parse(data: BufferedReader | bytes, type: FloatType) -> float:
+    def parse(data: BufferedReader | bytes | memoryview, type: FloatType) -> float:
         size, format = type.value
 
         return struct.unpack(format, get_stream(data).read(size))[0]
@@ -127,6 +132,8 @@ class RawString(str):
         List = auto()
         """List of strings separated by `\\x00`."""
 
+    __slots__ = ("encoding",)
+
     encoding: str
 
     @staticmethod
@@ -141,15 +148,36 @@ class RawString(str):
         return raw
 
     @staticmethod
-    def decode(data: bytes):
+    def decode(data: bytes | memoryview, encodings: "EncodingDetector" = None):
         """
         Tries to decode `data` using all supported encodings.
+
+        The encodings are always tried in the same order, so that the same bytes
+        are decoded to the same string regardless of which strings were decoded
+        before. If `encodings` is specified, the used encoding is recorded in it.
         """
 
+        # Copy memoryview slices only now that their value is actually needed
+        data = bytes(data)
+
+        # ASCII is decoded the same by all supported encodings
+        if data.isascii():
+            string = RawString(data.decode("ascii"))
+            string.encoding = "utf8"
+
+            if encodings is not None:
+                encodings.add("ascii")
+
+            return string
+
         for encoding in RawString.SUPPORTED_ENCODINGS:
             try:
                 string = RawString(data.decode(encoding))
                 string.encoding = encoding
+
+                if encodings is not None:
+                    encodings.add(encoding)
+
                 return string
             except UnicodeDecodeError:
                 pass
@@ -161,9 +189,18 @@ class RawString(str):
     @staticmethod
     def encode(string: "RawString") -> bytes:
         """
-        Tries to encode `string` using all supported encodings.
+        Tries to encode `string` using its known encoding first
+        and all supported encodings afterwards.
         """
 
+        encoding = getattr(string, "encoding", None)
+
+        if encoding is not None:
+            try:
+                return str(string).encode(encoding)
+            except UnicodeEncodeError:
+                pass
+
         for encoding in RawString.SUPPORTED_ENCODINGS:
             try:
                 data = str(string).encode(encoding)
@@ -177,47 +214,52 @@ class RawString(str):
             return data
 
     @staticmethod
-    def parse(data: BufferedReader | bytes, type: StrType, size: int = None):
+    def parse(
+        data: BufferedReader | bytes | memoryview,
+        type: StrType,
+        size: int = None,
+        encodings: "EncodingDetector" = None,
+    ):
+        # Strings are decoded right away so copy their data once
+        # instead of reading memoryview slices byte by byte
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+
         stream = get_stream(data)
 
         match type:
             case type.Char:
-                return read_data(stream, 1)
+                return bytes(read_data(stream, 1))
 
             case type.WChar:
-                return read_data(stream, 2)
+                return bytes(read_data(stream, 2))
 
             case type.BZString | type.BString:
                 size = Integer.parse(stream, Integer.IntType.UInt8)
-                data = read_data(stream, size).strip(b"\x00")
-                return RawString.decode(data)
+                data = bytes(read_data(stream, size)).strip(b"\x00")
+                return RawString.decode(data, encodings)
 
             case type.WString | type.WZString:
                 size = Integer.parse(stream, Integer.IntType.Int16)
-                data = read_data(stream, size).strip(b"\x00")
-                return RawString.decode(data)
+                data = bytes(read_data(stream, size)).strip(b"\x00")
+                return RawString.decode(data, encodings)
 
             case type.ZString:
-                data = b""
-                while (char := stream.read(1)) != b"\x00" and char:
-                    data += char
-
-                return RawString.decode(data)
+                data = read_zstring(stream)
+                return RawString.decode(data, encodings)
 
             case type.String:
                 data = read_data(stream, size)
-                return RawString.decode(data)
+                return RawString.decode(data, encodings)
 
             case type.List:
                 strings: list[RawString] = []
 
-                while len(strings) < size:
-                    string = b""
-                    while (char := stream.read(1)) != b"\x00" and char:
-                        string += char
+                while len(strings) < size and peek(stream, 1):
+                    string = read_zstring(stream)
 
                     if string:
-                        strings.append(RawString.decode(string))
+                        strings.append(RawString.decode(string, encodings))
 
                 return strings
 
@@ -251,23 +293,67 @@ class RawString(str):
                 return RawString.encode(value) + b"\x00"
 
             case type.List:
-                data = b"\x00".join(RawString.encode(v) for v in value) + b"\x00"
+                data = b"\x00".join(map(RawString.encode, value)) + b"\x00"
 
                 return data
 
 
+class EncodingDetector:
+    """
+    Counts the encodings used by the strings of a plugin.
+
+    The counts do not change how strings are decoded, since the decoded text
+    would then depend on the order in which strings are parsed. Strings are
+    written back in the encoding they were decoded with instead.
+    """
+
+    counts: dict[str, int]
+    """
+    Number of decoded strings per encoding ("ascii" for pure ASCII strings).
+    """
+
+    def __init__(self):
+        self.counts = dict.fromkeys(["ascii", *RawString.SUPPORTED_ENCODINGS], 0)
+
+    def __repr__(self) -> str:
+        return f"EncodingDetector({self.counts})"
+
+    def add(self, encoding: str):
+        """
+        Records that a string was decoded with `encoding`.
+        """
+
+        self.counts[encoding] += 1
+
+
+FLAGS_CACHE: dict[tuple[type, int], "Flags"] = {}
+"""
+Cache for flag values as creating IntFlag objects is expensive.
+"""
+
+
 class Flags(enum.IntFlag):
     """
     Class for all types of flags.
     """
 
     @classmethod
-    def parse(cls, data: BufferedReader | bytes, type: Integer.IntType):
+    def parse(cls, data: BufferedReader | bytes | memoryview, type: Integer.IntType):
         value = Integer.parse(data, type)
 
-        flag = cls(value)
+        return cls.from_value(value)
+
+    @classmethod
+    def from_value(cls, value: int):
+        """
+        Returns cached flag object for `value`.
+        """
 
-        return flag
+        try:
+            return FLAGS_CACHE[cls, value]
+        except KeyError:
+            flag = FLAGS_CACHE[cls, value] = cls(value)
+            return flag
 
     def dump(self, type: Integer.IntType):
         return Integer.dump(self.value, type)
@@ -282,11 +368,20 @@ class Hex:
 
     @staticmethod
     def parse(
-        data: BufferedReader | bytes, type: Integer.IntType = Integer.IntType.ULong
+        data: BufferedReader | bytes | memoryview,
+        type: Integer.IntType = Integer.IntType.ULong,
     ):
         number = Integer.parse(data, type)
 
-        return hex(number).removeprefix("0x").upper().zfill(8)
+        return Hex.format(number)
+
+    @staticmethod
+    def format(number: int) -> str:
+        """
+        Formats `number` as upper-case hexadecimal string padded to 8 digits.
+        """
+
+        return f"{number:08X}"
 
     @staticmethod
     def dump(value: str, type: Integer.IntType = Integer.IntType.ULong):
@@ -3,12 +3,22 @@ Copyright (c) Cutleast
 """
 
 import logging
+import weakref
+import zlib
 from enum import IntEnum
-from io import BufferedReader, BytesIO
+from io import BufferedReader, BufferedWriter, BytesIO
+from typing import Iterator
 
-from .datatypes import Flags, Hex, Integer
+from .codec import GROUP_HEADER, UINT32
+from .datatypes import EncodingDetector, Flags, Integer
 from .record import Record
-from .utilities import peek, prettyprint_object
+from .utilities import (
+    BufferStream,
+    get_stream,
+    get_type_code,
+    peek,
+    prettyprint_object,
+)
 
 log = logging.getLogger("PluginParser.Group")
 
@@ -18,17 +28,75 @@ class Group:
     Class for GRUP records.
     """
 
+    __slots__ = (
+        "type",
+        "group_size",
+        "label",
+        "group_type",
+        "timestamp",
+        "version_control_info",
+        "unknown",
+        "children",
+        "grid",
+        "block_number",
+        "subblock_number",
+        "parent_cell",
+        "__parent",
+        "source_offset",
+        "source_size",
+        "modified",
+        "__size",
+        "__weakref__",
+    )
+
     type: str
     group_size: int
-    label: bytes | str | int
+    label: str | int
     group_type: int
     timestamp: int
     version_control_info: int
     unknown: int
-    data: bytes
 
     children: list
 
+    grid: tuple[int, int]
+    block_number: int
+    subblock_number: int
+    parent_cell: int
+
+    __parent: "weakref.ref[Group] | None"
+    """
+    Weak reference to the group containing this group.
+    """
+
+    source_offset: int | None
+    """
+    Offset of this group including its header in the buffer the plugin
+    was parsed from, only set if the plugin was parsed from a buffer.
+    """
+
+    source_size: int
+    """
+    Original size of this group including its header.
+    """
+
+    modified: bool
+    """
+    Whether a record in this group was modified since it was parsed.
+    Unmodified groups are copied from the buffer the plugin was parsed from
+    when they are written.
+    """
+
+    __size: int | None
+    """
+    Cached size of this group including its header, reset when it is modified.
+    """
+
+    NESTED_GROUP_TYPES = ["CELL", "DIAL", "WRLD"]
+    """
+    Types of top-level groups that contain nested groups of other record types.
+    """
+
     class GroupType(IntEnum):
         """
         Group types. See https://en.uesp.net/wiki/Skyrim_Mod:Mod_File_Format#Groups for more.
@@ -45,65 +113,115 @@ class Group:
         CellPersistentChildren = 8  # Persistent Cell Record
         CellTemporaryChildren = 9  # Temporary Cell Record
 
+    def __init__(self):
+        self.__parent = None
+        self.source_offset = None
+        self.modified = False
+        self.__size = None
+
     def __repr__(self) -> str:
         return prettyprint_object(self)
 
+    @property
+    def parent(self) -> "Group | None":
+        """
+        Group containing this group, None for top-level groups.
+
+        Only a weak reference is kept so that nested groups do not form
+        reference cycles and are released as soon as the plugin releases them.
+        """
+
+        return self.__parent() if self.__parent is not None else None
+
+    @parent.setter
+    def parent(self, parent: "Group | None"):
+        self.__parent = weakref.ref(parent) if parent is not None else None
+
     def __len__(self):
-        return len(self.dump())
+        if not self.modified and self.source_offset is not None:
+            return self.source_size
+
+        if self.__size is None:
+            self.__size = GROUP_HEADER.size + sum(map(len, self.children))
+
+        return self.__size
+
+    def parse(
+        self,
+        stream: BufferedReader | BufferStream,
+        header_flags: Flags,
+        lazy: bool = False,
+        encodings: EncodingDetector = None,
+    ):
+        start = stream.tell()
 
-    def parse(self, stream: BufferedReader, header_flags: Flags):
-        self.type = stream.read(4).decode()
-        self.group_size = Integer.parse(stream, Integer.IntType.UInt32)
-        label = stream.read(4)
-        self.group_type = Integer.parse(stream, Integer.IntType.Int32)
-        self.timestamp = Integer.parse(stream, Integer.IntType.UInt16)
-        self.version_control_info = Integer.parse(stream, Integer.IntType.UInt16)
-        self.unknown = Integer.parse(stream, Integer.IntType.UInt32)
+        self.parse_header(stream)
 
-        self.data = stream.read(self.group_size - 24)
-        record_stream = BytesIO(self.data)
+        # The raw data is not kept as the children hold all of it after parsing
+        if isinstance(stream, BufferStream):
+            record_stream = stream.read_stream(self.group_size - 24)
+        else:
+            record_stream = get_stream(stream.read(self.group_size - 24))
+
+        self.modified = False
+        self.__size = None
+        if isinstance(stream, BufferStream):
+            self.source_offset = stream.offset + start
+            self.source_size = stream.tell() - start
+
+        self.parse_records(record_stream, header_flags, lazy, encodings)
+
+    def parse_header(self, stream: BufferedReader | BufferStream):
+        """
+        Parses the header and label of this group from `stream`
+        without parsing its children.
+        """
+
+        (
+            type,
+            self.group_size,
+            label,
+            self.group_type,
+            self.timestamp,
+            self.version_control_info,
+            self.unknown,
+        ) = GROUP_HEADER.unpack(stream.read(GROUP_HEADER.size))
+        self.type = get_type_code(type)
 
         match self.group_type:
             # Normal groups
             case Group.GroupType.Normal:
-                self.label = label.decode()
-                self.parse_records(record_stream, header_flags)
+                self.label = get_type_code(label)
 
             # Dialogue Groups
             case Group.GroupType.TopicChildren:
-                self.label = Hex.parse(label)
-                self.parse_records(record_stream, header_flags)
+                self.label = Integer.parse(label, Integer.IntType.UInt32)
 
             # Worldspace Group
             case Group.GroupType.WorldChildren:
-                self.label = Hex.parse(label)
-                self.parse_records(record_stream, header_flags)
+                self.label = Integer.parse(label, Integer.IntType.UInt32)
 
             # Exterior Cells
             case Group.GroupType.ExteriorCellBlock:
-                label_stream = BytesIO(label)
+                label_stream = get_stream(label)
                 self.grid = (
                     Integer.parse(label_stream, Integer.IntType.Int16),  # Y
                     Integer.parse(label_stream, Integer.IntType.Int16),  # X
                 )
-                self.parse_records(record_stream, header_flags)
 
             case Group.GroupType.ExteriorCellSubBlock:
-                label_stream = BytesIO(label)
+                label_stream = get_stream(label)
                 self.grid = (
                     Integer.parse(label_stream, Integer.IntType.Int16),  # Y
                     Integer.parse(label_stream, Integer.IntType.Int16),  # X
                 )
-                self.parse_records(record_stream, header_flags)
 
             # Interior Cells
             case Group.GroupType.InteriorCellBlock:
                 self.block_number = Integer.parse(label, Integer.IntType.Int32)
-                self.parse_records(record_stream, header_flags)
 
             case Group.GroupType.InteriorCellSubBlock:
                 self.subblock_number = Integer.parse(label, Integer.IntType.Int32)
-                self.parse_records(record_stream, header_flags)
 
             # Cell Children
             case (
@@ -111,46 +229,89 @@ class Group:
                 | Group.GroupType.CellPersistentChildren
                 | Group.GroupType.CellTemporaryChildren
             ):
-                self.parent_cell = Hex.parse(label)
-                self.parse_records(record_stream, header_flags)
+                self.parent_cell = Integer.parse(label, Integer.IntType.UInt32)
 
             # Unknown
             case self.unknown:
                 log.warning(f"Unknown Group Type: {self.group_type}")
                 raise Exception(f"Unknown Group Type: {self.group_type}")
 
-    def parse_records(self, stream: BytesIO, header_flags: Flags):
+    def parse_records(
+        self,
+        stream: BytesIO | BufferStream,
+        header_flags: Flags,
+        lazy: bool = False,
+        encodings: EncodingDetector = None,
+    ):
         self.children = []
 
         while child_type := peek(stream, 4):
-            child_type = child_type.decode()
+            child_type = bytes(child_type).decode()
 
             if child_type == "GRUP":
                 child = Group()
             else:
                 child = Record()
 
-            child.parse(stream, header_flags)
+            child.parse(stream, header_flags, lazy, encodings)
+            child.parent = self
             self.children.append(child)
 
-    def dump(self) -> bytes:
-        data = b""
+    def iter_records(self) -> Iterator[Record]:
+        """
+        Yields the records of this group and all nested groups.
+        """
+
+        for child in self.children:
+            if isinstance(child, Group):
+                yield from child.iter_records()
+            else:
+                yield child
+
+    def mark_modified(self):
+        """
+        Marks this group and the groups containing it as modified
+        and resets their cached sizes.
+        """
 
-        child_data = b"".join(child.dump() for child in self.children)
-        self.group_size = (
-            len(child_data) + 24
-        )  # Size of subgroups and records including Group Header
+        if self.modified and self.__size is None:
+            return
 
-        data += self.type.encode()
-        data += Integer.dump(self.group_size, Integer.IntType.UInt32)
+        self.modified = True
+        self.__size = None
+
+        parent = self.parent
+        if parent is not None:
+            parent.mark_modified()
+
+    def write(
+        self,
+        stream: BufferedWriter | BytesIO,
+        source: memoryview | None = None,
+        level: int = zlib.Z_DEFAULT_COMPRESSION,
+    ):
+        """
+        Writes this group and its children to `stream`.
+
+        `source` is the buffer the plugin was parsed from, it is required
+        if the group was parsed from a buffer. Unmodified groups are copied from it.
+        `level` is the zlib compression level used for compressed records.
+
+        The children are streamed after a placeholder header whose size is
+        patched afterwards, so `stream` has to be seekable.
+        """
+
+        if not self.modified and self.source_offset is not None:
+            end = self.source_offset + self.source_size
+            stream.write(source[self.source_offset : end])
+            return
 
         match self.group_type:
             case Group.GroupType.Normal:
-                data += self.label.encode()
+                label = self.label.encode()
 
             case Group.GroupType.WorldChildren | Group.GroupType.TopicChildren:
-                # print(self.group_type)
-                data += Hex.dump(self.label)
+                label = Integer.dump(self.label, Integer.IntType.UInt32)
 
             # Cell Children
             case (
@@ -158,24 +319,46 @@ class Group:
                 | Group.GroupType.CellPersistentChildren
                 | Group.GroupType.CellTemporaryChildren
             ):
-                data += Hex.dump(self.parent_cell)
+                label = Integer.dump(self.parent_cell, Integer.IntType.UInt32)
 
             case (
                 Group.GroupType.ExteriorCellBlock | Group.GroupType.ExteriorCellSubBlock
             ):
-                data += Integer.dump(self.grid[0], Integer.IntType.Int16)  # Y
-                data += Integer.dump(self.grid[1], Integer.IntType.Int16)  # X
+                label = Integer.dump(self.grid[0], Integer.IntType.Int16)  # Y
+                label += Integer.dump(self.grid[1], Integer.IntType.Int16)  # X
 
             case Group.GroupType.InteriorCellBlock:
-                data += Integer.dump(self.block_number, Integer.IntType.Int32)
+                label = Integer.dump(self.block_number, Integer.IntType.Int32)
 
             case Group.GroupType.InteriorCellSubBlock:
-                data += Integer.dump(self.subblock_number, Integer.IntType.Int32)
-
-        data += Integer.dump(self.group_type, Integer.IntType.Int32)
-        data += Integer.dump(self.timestamp, Integer.IntType.UInt16)
-        data += Integer.dump(self.version_control_info, Integer.IntType.UInt16)
-        data += Integer.dump(self.unknown, Integer.IntType.UInt32)
-        data += child_data
-
-        return data
+                label = Integer.dump(self.subblock_number, Integer.IntType.Int32)
+
+        start = stream.tell()
+        stream.write(
+            GROUP_HEADER.pack(
+                self.type.encode(),
+                0,  # Placeholder for the group size
+                label,
+                self.group_type,
+                self.timestamp,
+                self.version_control_info,
+                self.unknown,
+            )
+        )
+
+        for child in self.children:
+            child.write(stream, source, level)
+
+        end = stream.tell()
+        self.group_size = end - start
+
+        # Patch the group size in the header
+        stream.seek(start + 4)
+        stream.write(UINT32.pack(self.group_size))
+        stream.seek(end)
+
+    def dump(self, source: memoryview | None = None) -> bytes:
+        stream = BytesIO()
+        self.write(stream, source)
+
+        return stream.getvalue()
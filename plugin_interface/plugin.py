@@ -3,15 +3,23 @@ Copyright (c) Cutleast
 """
 
 import logging
-from io import BufferedReader
+import mmap
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BufferedReader, BufferedWriter, BytesIO
 from pathlib import Path
+from typing import Callable, Iterator
 
 from . import utilities as utils
-from .datatypes import RawString
+from .codec import GROUP_HEADER, RECORD_HEADER, UINT32
+from .datatypes import EncodingDetector, RawString
 from .flags import RecordFlags
 from .group import Group
 from .plugin_string import PluginString
+from .probe import PluginProbe
 from .record import Record
+from .string_table import StringTable, StringTables
 from .subrecord import EDID, MAST, StringSubrecord
 
 
@@ -21,16 +29,80 @@ class Plugin:
     """
 
     path: Path
+    zero_copy: bool
+    memory_map: bool
+    lazy: bool
+    threaded: bool
+
+    compression_level: int
+    """
+    zlib compression level (0-9 or -1 for the default) used for records
+    that are compressed again when saving.
+    """
 
     header: Record
     groups: list[Group]
 
-    __string_subrecords: dict[PluginString, StringSubrecord] = None
+    encodings: EncodingDetector
+    """
+    Encodings of the strings in this plugin.
+    """
+
+    string_tables: StringTables | None = None
+    """
+    String tables that localized strings are resolved from,
+    loaded by `load_string_tables()`.
+    """
+
+    source: memoryview | None = None
+    """
+    Buffer the plugin was parsed from, if any. Groups and records only keep
+    their offsets in it and unmodified ones are copied from it when writing.
+    """
+
+    __string_index: dict[tuple[int, str, str, int | None, str], StringSubrecord] = None
+    __mapping: mmap.mmap = None
+
+    WRITE_BUFFER_SIZE = 1024 * 1024
+    """
+    Size of the write buffer used when saving plugins.
+    """
+
+    CHUNKS_PER_WORKER = 4
+    """
+    Number of chunks per worker process the plugin is split into
+    for parallel scanning, so that large groups do not stall a single worker.
+    """
+
+    MIN_CHUNK_SIZE = 1024 * 1024
+    """
+    Minimum size of a chunk for parallel scanning in bytes.
+    """
+
+    THREAD_BATCH_SIZE = 1024 * 1024
+    """
+    Minimum uncompressed size of the records that are decompressed or compressed
+    by a single task of the thread pool in bytes, so that the zlib work
+    outweighs the overhead of the tasks.
+    """
 
     log = logging.getLogger("PluginInterface")
 
-    def __init__(self, path: Path):
+    def __init__(
+        self,
+        path: Path,
+        zero_copy: bool = False,
+        memory_map: bool = False,
+        lazy: bool = False,
+        threaded: bool = False,
+        compression_level: int = zlib.Z_DEFAULT_COMPRESSION,
+    ):
         self.path = path
+        self.zero_copy = zero_copy
+        self.memory_map = memory_map
+        self.lazy = lazy
+        self.threaded = threaded
+        self.compression_level = compression_level
 
         self.load()
 
@@ -38,42 +110,284 @@ class Plugin:
         return utils.prettyprint_object(self)
 
     def __len__(self):
-        return len(self.dump())
+        # Compressed sizes depend on the compression level
+        self.compress_records()
+
+        return len(self.header) + sum(map(len, self.groups))
 
     def __str__(self) -> str:
         return self.__repr__()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def load(self):
-        with self.path.open("rb") as stream:
-            self.parse(stream)
+        """
+        Loads and parses the plugin file.
+
+        If `zero_copy` is True, the file is read into a single buffer
+        and parsed from memoryview slices of it.
+
+        If `memory_map` is True, the file is memory-mapped read-only and parsed
+        directly from the mapping, leaving the plugin data to the OS page cache
+        which is shared between all processes that map the same file.
+        """
+
+        if self.memory_map:
+            with self.path.open("rb") as file:
+                self.__mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self.parse(memoryview(self.__mapping))
+        elif self.zero_copy:
+            self.parse(self.path.read_bytes())
+        else:
+            with self.path.open("rb") as stream:
+                self.parse(stream)
+
+    def parse(self, stream: BufferedReader | bytes | memoryview | mmap.mmap):
+        """
+        Parses plugin from `stream`.
+
+        If `stream` is a buffer, groups and records keep their offsets in it
+        and subrecords keep memoryview slices of it instead of copies
+        of their data, except for small ones.
+
+        If `lazy` is True, subrecords of records are parsed
+        the first time they are accessed.
+
+        If `threaded` is True, compressed records are collected while walking
+        the groups and decompressed in a thread pool afterwards.
+        """
 
-    def parse(self, stream: BufferedReader):
         self.log.info(f"Parsing {str(self.path)!r}...")
 
+        if isinstance(stream, (bytes, bytearray, memoryview, mmap.mmap)):
+            stream = utils.BufferStream(stream)
+            self.source = stream.view
+        else:
+            self.source = None
+
         self.groups = []
+        self.encodings = EncodingDetector()
 
         self.header = Record()
         self.header.parse(stream, [])
 
+        # Decompression is deferred until all compressed records are collected
+        lazy = self.lazy or self.threaded
+
         while utils.peek(stream, 1):
             group = Group()
-            group.parse(stream, self.header.flags)
+            group.parse(stream, self.header.flags, lazy, self.encodings)
             self.groups.append(group)
 
+        if self.threaded:
+            self.decompress_records()
+
         self.log.info("Parsing complete.")
 
-    def dump(self):
-        data = b""
+    def decompress_records(self):
+        """
+        Decompresses compressed records in a thread pool and parses the subrecords
+        of all records afterwards unless `lazy` is True.
+
+        If `lazy` is True, only records that can contain strings are decompressed.
+        """
+
+        records = [
+            record
+            for group in self.groups
+            for record in group.iter_records()
+            if record.compressed_data is not None
+            and (not self.lazy or record.has_strings)
+        ]
+
+        Plugin.run_batched(Record.decompress, records)
+
+        if not self.lazy:
+            for group in self.groups:
+                for record in group.iter_records():
+                    record.parse_data()
+
+    @staticmethod
+    def get_group_chunks(
+        data: mmap.mmap | bytes, offset: int, chunk_size: int
+    ) -> Iterator[tuple[int, list[tuple[int, int]]]]:
+        """
+        Yields the offset of each top-level group in `data` from `offset` on
+        and the ranges its children are split into.
+        Each range contains whole children and is at least `chunk_size` bytes large,
+        except for the last range of a group.
+        """
+
+        while offset < len(data):
+            (group_size,) = UINT32.unpack_from(data, offset + 4)
+            end = offset + group_size
+
+            chunks: list[tuple[int, int]] = []
+            chunk_start = position = offset + GROUP_HEADER.size
+
+            while position < end:
+                (size,) = UINT32.unpack_from(data, position + 4)
+
+                if data[position : position + 4] == b"GRUP":
+                    position += size
+                else:
+                    position += RECORD_HEADER.size + size
+
+                if position - chunk_start >= chunk_size:
+                    chunks.append((chunk_start, position))
+                    chunk_start = position
+
+            if chunk_start < end:
+                chunks.append((chunk_start, end))
+
+            yield offset, chunks
+            offset = end
+
+    def write(self, stream: BufferedWriter | BytesIO):
+        """
+        Writes plugin to `stream`.
+
+        If the plugin was parsed from a buffer, only modified records
+        and the groups containing them are serialized again,
+        everything else is copied verbatim from the buffer.
 
-        data += self.header.dump()
+        Records are compressed one at a time while they are written,
+        so that only one payload is kept in memory. If `threaded` is True,
+        the records of each top-level group are compressed in a thread pool
+        right before the group is written instead.
+        """
+
+        self.header.write(stream, self.source, self.compression_level)
 
         for group in self.groups:
-            data += group.dump()
+            if self.threaded:
+                self.compress_records([group])
+
+            group.write(stream, self.source, self.compression_level)
+
+    def compress_records(self, groups: list[Group] = None):
+        """
+        Compresses the payloads of all compressed records in `groups`
+        (defaults to all groups) that have to be serialized again
+        with `compression_level`. A thread pool is used if `threaded` is True.
+        """
+
+        records = [
+            record
+            for group in (groups if groups is not None else self.groups)
+            if group.modified or group.source_offset is None
+            for record in group.iter_records()
+            if record.needs_compression
+        ]
+
+        if self.threaded:
+            Plugin.run_batched(
+                lambda record: record.compress(self.compression_level), records
+            )
+        else:
+            for record in records:
+                record.compress(self.compression_level)
+
+    @staticmethod
+    def run_batched(function: Callable[[Record], None], records: list[Record]):
+        """
+        Calls `function` for all `records` in a thread pool.
+
+        The records are split into batches of at least `THREAD_BATCH_SIZE` bytes
+        that are processed by one task each. The records are processed
+        in the calling thread if there is only one batch or one CPU.
+        """
+
+        batches: list[list[Record]] = [[]]
+        batch_size = 0
+
+        for record in records:
+            if batch_size >= Plugin.THREAD_BATCH_SIZE:
+                batches.append([])
+                batch_size = 0
 
-        return data
+            batches[-1].append(record)
+            batch_size += record.size
+
+        def process_batch(batch: list[Record]):
+            for record in batch:
+                function(record)
+
+        if len(batches) == 1 or (os.cpu_count() or 1) == 1:
+            process_batch(records)
+            return
+
+        with ThreadPoolExecutor() as executor:
+            for _ in executor.map(process_batch, batches):
+                pass
+
+    def dump(self) -> bytes:
+        stream = BytesIO()
+        self.write(stream)
+
+        return stream.getvalue()
 
     def save(self):
-        self.path.write_bytes(self.dump())
+        """
+        Writes plugin to its file.
+
+        The data is written to a temporary file that replaces the original one
+        afterwards since the original file may still be memory-mapped.
+        Note that Windows does not allow replacing a mapped file,
+        so memory-mapped plugins must be closed and reloaded there.
+        """
+
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+
+        with temp_path.open("wb", buffering=Plugin.WRITE_BUFFER_SIZE) as stream:
+            self.write(stream)
+
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        """
+        Releases the parsed data and the memory mapping, if any.
+        """
+
+        self.header = None
+        self.groups = []
+        self.source = None
+        self.__string_index = None
+
+        if self.string_tables is not None:
+            self.string_tables.close()
+            self.string_tables = None
+
+        if self.__mapping is not None:
+            try:
+                self.__mapping.close()
+            except BufferError:
+                # Some subrecords are still referenced outside of this plugin,
+                # the mapping is closed when they are garbage collected
+                self.log.debug(f"Mapping of {str(self.path)!r} is still in use.")
+
+            self.__mapping = None
+
+    def load_string_tables(self, language: str = "english") -> StringTables:
+        """
+        Loads the string tables of this plugin for `language`.
+
+        Localized strings are resolved from them when extracting strings
+        so that localized plugins are extracted like regular plugins.
+        """
+
+        if self.string_tables is not None:
+            self.string_tables.close()
+
+        self.string_tables = StringTables(self.path, language)
+        self.__string_index = None
+
+        return self.string_tables
 
     @staticmethod
     def get_record_edid(record: Record):
@@ -84,6 +398,128 @@ class Plugin:
         except AttributeError:
             return None
 
+    @staticmethod
+    def get_masters(header: Record) -> list[str]:
+        """
+        Returns masters listed in plugin `header`.
+        """
+
+        return [
+            subrecord.file
+            for subrecord in header.subrecords
+            if isinstance(subrecord, MAST)
+        ]
+
+    @staticmethod
+    def get_master_table(plugin_path: Path, header: Record) -> list[tuple[int, str]]:
+        """
+        Returns the master index to use in extracted FormIDs, shifted into
+        the highest byte, and the name of the plugin that first defines
+        a record for each of the 256 possible master indices of a FormID.
+
+        Records with master indices that are not in the masters are defined
+        in the plugin itself and get the "FE" prefix if it is a light plugin.
+        """
+
+        masters = Plugin.get_masters(header)
+        is_light = (
+            plugin_path.suffix.lower() == ".esl"
+            or RecordFlags.LightMaster in header.flags
+        )
+
+        master_table: list[tuple[int, str]] = []
+
+        for master_index in range(256):
+            if master_index < len(masters):
+                master_table.append((master_index << 24, masters[master_index]))
+
+            # Replace Master Index by "FE" Prefix to indicate Light Plugin
+            # This is especially relevant for DSD
+            elif is_light:
+                master_table.append((0xFE << 24, plugin_path.name))
+
+            else:
+                master_table.append((master_index << 24, plugin_path.name))
+
+        return master_table
+
+    @staticmethod
+    def iter_record_strings(
+        record: Record,
+        master_table: list[tuple[int, str]],
+        extract_localized: bool = False,
+        unfiltered: bool = False,
+        string_tables: StringTables = None,
+    ) -> Iterator[tuple[PluginString, StringSubrecord]]:
+        """
+        Yields strings of parsed `record` together with their subrecords.
+
+        `master_table` is the table of the plugin from `get_master_table()`.
+        Localized strings are resolved from `string_tables` if specified.
+        """
+
+        edid = Plugin.get_record_edid(record)
+        formid = None
+
+        for subrecord in record.subrecords:
+            if isinstance(subrecord, StringSubrecord):
+                string: RawString | int = subrecord.string
+
+                if isinstance(string, int) and string_tables is not None:
+                    string = string_tables.get(string, string)
+
+                if not isinstance(string, RawString) and not extract_localized:
+                    continue
+
+                # Unresolved localized strings are checked as their ids
+                is_valid = utils.is_valid_string(str(string))
+
+                if not is_valid and not unfiltered:
+                    continue
+
+                if formid is None:
+                    master_index, master = master_table[record.formid >> 24]
+                    formid = PluginString.format_form_id(
+                        master_index | (record.formid & 0x00FFFFFF), master
+                    )
+
+                string_data = PluginString(
+                    edid,
+                    formid,
+                    subrecord.index,
+                    f"{record.type} {subrecord.type}",
+                    original_string=str(string),
+                    status=(
+                        PluginString.Status.TranslationRequired
+                        if is_valid
+                        else PluginString.Status.NoTranslationRequired
+                    ),
+                )
+
+                yield string_data, subrecord
+
+    def iter_group_strings(
+        self,
+        group: Group,
+        master_table: list[tuple[int, str]],
+        extract_localized: bool = False,
+        unfiltered: bool = False,
+    ) -> Iterator[tuple[PluginString, StringSubrecord]]:
+        """
+        Yields strings of parsed `group` and its nested groups
+        together with their subrecords.
+        """
+
+        for record in group.iter_records():
+            if record.has_strings:
+                yield from self.iter_record_strings(
+                    record,
+                    master_table,
+                    extract_localized,
+                    unfiltered,
+                    self.string_tables,
+                )
+
     def extract_group_strings(
         self, group: Group, extract_localized: bool = False, unfiltered: bool = False
     ):
@@ -91,62 +527,34 @@ class Plugin:
         Extracts strings from parsed <group>.
         """
 
-        strings: dict[PluginString, StringSubrecord] = {}
+        master_table = self.get_master_table(self.path, self.header)
 
-        masters = [
-            subrecord.file
-            for subrecord in self.header.subrecords
-            if isinstance(subrecord, MAST)
-        ]
+        return dict(
+            self.iter_group_strings(group, master_table, extract_localized, unfiltered)
+        )
 
-        record: Record | Group
-        for record in group.children:
-            if isinstance(record, Group):
-                strings |= self.extract_group_strings(record, extract_localized)
-            else:
-                edid = self.get_record_edid(record)
-                master_index = int(record.formid[:2], base=16)
+    def iter_strings(
+        self, extract_localized: bool = False, unfiltered: bool = False
+    ) -> Iterator[PluginString]:
+        """
+        Yields strings of parsed plugin while walking it
+        so that they can be processed before the walk is complete.
 
-                # Get plugin that first defines this record from masters
-                try:
-                    master = masters[master_index]
-                # If index is not in masters, then the record is first defined in this plugin
-                except IndexError:
-                    master = self.path.name
+        Only yields strings that pass a filter if `unfiltered` is False.
+        Strings are unique per top-level group.
+        """
 
-                formid = f"{record.formid}|{master}"
+        master_table = self.get_master_table(self.path, self.header)
 
-                # Replace Master Index by "FE" Prefix to indicate Light Plugin
-                # This is especially relevant for DSD
-                if (
-                    self.path.suffix.lower() == ".esl"
-                    or RecordFlags.LightMaster in self.header.flags
-                ) and master == self.path.name:
-                    formid = "FE" + formid[2:]
-
-                for subrecord in record.subrecords:
-                    if isinstance(subrecord, StringSubrecord):
-                        string: RawString | int = subrecord.string
-
-                        if (isinstance(string, RawString) or extract_localized) and (
-                            utils.is_valid_string(string) or unfiltered
-                        ):
-                            string_data = PluginString(
-                                edid,
-                                formid,
-                                subrecord.index,
-                                f"{record.type} {subrecord.type}",
-                                original_string=str(string),
-                                status=(
-                                    PluginString.Status.TranslationRequired
-                                    if utils.is_valid_string(string)
-                                    else PluginString.Status.NoTranslationRequired
-                                ),
-                            )
-
-                            strings[string_data] = subrecord
+        for group in self.groups:
+            strings: set[PluginString] = set()
 
-        return strings
+            for string, _ in self.iter_group_strings(
+                group, master_table, extract_localized, unfiltered
+            ):
+                if string not in strings:
+                    strings.add(string)
+                    yield string
 
     def extract_strings(
         self, extract_localized: bool = False, unfiltered: bool = False
@@ -157,16 +565,269 @@ class Plugin:
         Only returns strings that pass a filter if `unfiltered` is False.
         """
 
+        return list(self.iter_strings(extract_localized, unfiltered))
+
+    @staticmethod
+    def scan_records(
+        data: bytes,
+        header_flags: RecordFlags,
+        encodings: EncodingDetector = None,
+    ) -> Iterator[Record]:
+        """
+        Yields records that can contain strings from `data`,
+        which contains whole groups and records.
+
+        Nested groups are descended into by skipping their headers, since their
+        children follow directly, and all other records are skipped
+        without being parsed.
+        """
+
+        stream = utils.BufferStream(data)
+        position = 0
+
+        while position < len(data):
+            type = utils.get_type_code(data[position : position + 4])
+
+            if type == "GRUP":
+                position += GROUP_HEADER.size
+
+            elif utils.is_string_record(type):
+                stream.seek(position)
+                record = Record()
+                record.parse(stream, header_flags, encodings=encodings)
+                position = stream.tell()
+                yield record
+
+            else:
+                (size,) = UINT32.unpack_from(data, position + 4)
+                position += RECORD_HEADER.size + size
+
+    @staticmethod
+    def scan_strings(
+        plugin_path: Path,
+        extract_localized: bool = False,
+        unfiltered: bool = False,
+        parallel: bool = False,
+        language: str = None,
+    ) -> Iterator[PluginString]:
+        """
+        Extracts strings from the plugin at `plugin_path` without parsing it fully.
+
+        Top-level groups whose records cannot contain strings are skipped entirely,
+        all other top-level groups are read at once and only records
+        that can contain strings are parsed from them.
+        Yields the same strings as `Plugin(plugin_path).extract_strings()`.
+
+        If `parallel` is True, the groups are scanned by a pool of worker processes.
+
+        If `language` is specified, localized strings are resolved
+        from the string tables of the plugin for that language.
+        """
+
+        if parallel:
+            yield from Plugin.scan_strings_parallel(
+                plugin_path, extract_localized, unfiltered, language
+            )
+            return
+
+        with plugin_path.open("rb") as stream:
+            header = Record()
+            header.parse(stream, [])
+
+            master_table = Plugin.get_master_table(plugin_path, header)
+            encodings = EncodingDetector()
+
+            string_tables = None
+            if language is not None and RecordFlags.Localized in header.flags:
+                string_tables = StringTables(plugin_path, language)
+
+            while group_header := stream.read(GROUP_HEADER.size):
+                _, group_size, label, *_ = GROUP_HEADER.unpack(group_header)
+                label = utils.get_type_code(label)
+
+                if (
+                    label not in Group.NESTED_GROUP_TYPES
+                    and not utils.is_string_record(label)
+                ):
+                    stream.seek(group_size - GROUP_HEADER.size, 1)
+                    continue
+
+                # Strings are unique per top-level group like in `extract_strings()`
+                strings: set[PluginString] = set()
+                group_data = stream.read(group_size - GROUP_HEADER.size)
+
+                for record in Plugin.scan_records(group_data, header.flags, encodings):
+                    for string, _ in Plugin.iter_record_strings(
+                        record,
+                        master_table,
+                        extract_localized,
+                        unfiltered,
+                        string_tables,
+                    ):
+                        if string not in strings:
+                            strings.add(string)
+                            yield string
+
+            if string_tables is not None:
+                string_tables.close()
+
+    @staticmethod
+    def scan_strings_parallel(
+        plugin_path: Path,
+        extract_localized: bool = False,
+        unfiltered: bool = False,
+        language: str = None,
+    ) -> Iterator[PluginString]:
+        """
+        Like `scan_strings()` but the top-level groups are split into chunks
+        that are scanned by a pool of worker processes.
+        """
+
+        with plugin_path.open("rb") as file:
+            header = Record()
+            header.parse(file, [])
+            offset = file.tell()
+
+            if offset == plugin_path.stat().st_size:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                workers = os.cpu_count() or 1
+                chunk_size = max(
+                    Plugin.MIN_CHUNK_SIZE,
+                    len(mapping) // (workers * Plugin.CHUNKS_PER_WORKER),
+                )
+
+                group_chunks: list[list[tuple[int, int]]] = []
+                for group_offset, chunks in Plugin.get_group_chunks(
+                    mapping, offset, chunk_size
+                ):
+                    label = mapping[group_offset + 8 : group_offset + 12].decode()
+
+                    if label in Group.NESTED_GROUP_TYPES or utils.is_string_record(
+                        label
+                    ):
+                        group_chunks.append(chunks)
+
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [
+                [
+                    executor.submit(
+                        Plugin.scan_chunk,
+                        plugin_path,
+                        start,
+                        end,
+                        extract_localized,
+                        unfiltered,
+                        language,
+                    )
+                    for start, end in chunks
+                ]
+                for chunks in group_chunks
+            ]
+
+            for group_futures in futures:
+                # Strings are unique per top-level group like in `extract_strings()`
+                strings: set[PluginString] = set()
+
+                for future in group_futures:
+                    for string in future.result():
+                        if string not in strings:
+                            strings.add(string)
+                            yield string
+
+    @staticmethod
+    def scan_chunk(
+        plugin_path: Path,
+        start: int,
+        end: int,
+        extract_localized: bool = False,
+        unfiltered: bool = False,
+        language: str = None,
+    ) -> list[PluginString]:
+        """
+        Extracts strings from the groups and records between `start` and `end`
+        of the plugin at `plugin_path`.
+        Runs in the worker processes of `scan_strings_parallel()`.
+        """
+
+        with plugin_path.open("rb") as file:
+            header = Record()
+            header.parse(file, [])
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                data = mapping[start:end]
+
+        master_table = Plugin.get_master_table(plugin_path, header)
+        encodings = EncodingDetector()
         strings: list[PluginString] = []
 
-        for group in self.groups:
-            current_group: list[PluginString] = list(
-                self.extract_group_strings(group, extract_localized, unfiltered).keys()
+        string_tables = None
+        if language is not None and RecordFlags.Localized in header.flags:
+            string_tables = StringTables(plugin_path, language)
+
+        for record in Plugin.scan_records(data, header.flags, encodings):
+            strings += (
+                string
+                for string, _ in Plugin.iter_record_strings(
+                    record, master_table, extract_localized, unfiltered, string_tables
+                )
             )
-            strings += current_group
+
+        if string_tables is not None:
+            string_tables.close()
 
         return strings
 
+    @staticmethod
+    def get_string_key(
+        form_id: int, master: str, type: str, string: str, index: int | None
+    ) -> tuple[int, str, str, int | None, str]:
+        """
+        Returns key of a string in the string index of a plugin.
+        """
+
+        # Ignore master index and FE prefix
+        return (form_id & 0x00FFFFFF, master, type, index, string)
+
+    def get_string_index(
+        self,
+    ) -> dict[tuple[int, str, str, int | None, str], StringSubrecord]:
+        """
+        Returns index of all string subrecords in this plugin.
+        It is built on first access.
+        """
+
+        if self.__string_index is None:
+            master_table = self.get_master_table(self.path, self.header)
+            string_index: dict[
+                tuple[int, str, str, int | None, str], StringSubrecord
+            ] = {}
+
+            for group in self.groups:
+                for record in group.iter_records():
+                    if not record.has_strings:
+                        continue
+
+                    master = master_table[record.formid >> 24][1]
+
+                    for string, subrecord in self.iter_record_strings(
+                        record, master_table, string_tables=self.string_tables
+                    ):
+                        key = self.get_string_key(
+                            record.formid,
+                            master,
+                            string.type,
+                            string.original_string,
+                            string.index,
+                        )
+                        # Keep first match like a linear search would
+                        string_index.setdefault(key, subrecord)
+
+            self.__string_index = string_index
+
+        return self.__string_index
+
     def find_string_subrecord(
         self, form_id: str, type: str, string: str, index: int | None
     ) -> StringSubrecord | None:
@@ -174,41 +835,120 @@ class Plugin:
         Finds subrecord that matches the given parameters.
         """
 
-        if self.__string_subrecords is None:
-            string_subrecords: dict[PluginString, StringSubrecord] = {}
+        form_id, master = PluginString.split_form_id(form_id)
 
-            for group in self.groups:
-                current_group = self.extract_group_strings(group)
-                string_subrecords |= current_group
-
-            self.__string_subrecords = string_subrecords
-
-        for plugin_string, subrecord in self.__string_subrecords.items():
-            if (
-                plugin_string.form_id[2:]
-                == form_id[2:]  # Ignore master index and FE prefix
-                and plugin_string.type == type
-                and plugin_string.original_string == string
-                and plugin_string.index == index
-            ):
-                return subrecord
+        if form_id is None:
+            return None
+
+        key = self.get_string_key(form_id, master, type, string, index)
+
+        return self.get_string_index().get(key)
 
-    def replace_strings(self, strings: list[PluginString]):
+    def replace_strings(self, strings: list[PluginString]) -> list[PluginString]:
         """
-        Replaces strings in plugin by `strings`.
+        Replaces strings in plugin by `strings` in a single pass.
+
+        Localized strings that are resolved from loaded string tables
+        are not replaced, they have to be written with `write_string_tables()`.
+
+        Returns strings whose subrecord could not be found or is localized.
         """
 
+        missing_strings: list[PluginString] = []
+        localized_strings: list[PluginString] = []
+
         for string in strings:
             subrecord = self.find_string_subrecord(
                 string.form_id, string.type, string.original_string, string.index
             )
 
-            if subrecord:
+            if not subrecord:
+                missing_strings.append(string)
+            elif isinstance(subrecord.string, int):
+                localized_strings.append(string)
+            else:
                 subrecord.set_string(string.translated_string)
+
+        if missing_strings:
+            self.log.error(
+                f"Failed to replace {len(missing_strings)} of {len(strings)} "
+                f"string(s) in {self.path.name!r}: Subrecords not found!"
+            )
+
+        if localized_strings:
+            self.log.error(
+                f"Failed to replace {len(localized_strings)} of {len(strings)} "
+                f"string(s) in {self.path.name!r}: Strings are localized, "
+                "use write_string_tables() to translate them!"
+            )
+
+        return missing_strings + localized_strings
+
+    def write_string_tables(
+        self,
+        strings: list[PluginString],
+        language: str,
+        folder: Path = None,
+        encoding: str = "utf8",
+    ) -> list[PluginString]:
+        """
+        Writes the string tables of this localized plugin for `language`
+        with `strings` replaced by their translations.
+
+        The plugin itself is left untouched since it only references
+        its strings by their ids. The string tables to translate have to be
+        loaded by `load_string_tables()` first. The tables are written
+        to the "Strings" folder in `folder` (defaults to the folder of the plugin),
+        replacing existing tables of `language` there.
+
+        The loaded string tables are closed before writing, since they may be
+        the tables that are replaced.
+
+        Returns strings whose subrecord could not be found.
+        """
+
+        if self.string_tables is None:
+            raise ValueError("String tables must be loaded to write them!")
+
+        translations: dict[int, str] = {}
+        missing_strings: list[PluginString] = []
+
+        for string in strings:
+            subrecord = self.find_string_subrecord(
+                string.form_id, string.type, string.original_string, string.index
+            )
+
+            if subrecord is not None and isinstance(subrecord.string, int):
+                translations[subrecord.string] = string.translated_string
             else:
-                self.log.error(
-                    f"Failed to replace string {string}: Subrecord not found!"
-                )
+                missing_strings.append(string)
+
+        if missing_strings:
+            self.log.error(
+                f"Failed to replace {len(missing_strings)} of {len(strings)} "
+                f"string(s) in {self.path.name!r}: Subrecords not found!"
+            )
+
+        paths = StringTables.get_paths(self.path, language, folder)
+        # Replace existing tables even if the case of their names differs
+        paths |= StringTables.find_paths(
+            (folder or self.path.parent) / self.path.name, language
+        )
+
+        tables = {
+            type: {id: translations.get(id) or table.get(id) for id in table}
+            for type, table in self.string_tables.tables.items()
+        }
+
+        self.string_tables.close()
+        self.string_tables = None
+
+        for type, table_strings in tables.items():
+            StringTable.write(paths[type], table_strings, type, encoding)
+
+        self.log.info(f"Wrote {language} string tables of {self.path.name!r}.")
+
+        return missing_strings
 
     @staticmethod
     def is_light(plugin_path: Path):
@@ -221,8 +961,4 @@ class Plugin:
         if plugin_path.suffix.lower() == ".esl":
             return True
 
-        with plugin_path.open("rb") as stream:
-            header = Record()
-            header.parse(stream, [])
-
-        return RecordFlags.LightMaster in header.flags
+        return PluginProbe.probe_file(plugin_path).is_light
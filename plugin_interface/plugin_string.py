@@ -4,14 +4,20 @@ by Cutleast and falls under the license
 Attribution-NonCommercial-NoDerivatives 4.0 International.
 """
 
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from enum import Enum, auto
+from typing import Iterable, Iterator
 
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class PluginString:
     """
     Class for translation strings.
+
+    Strings are identified by their FormID, EditorID, index and type.
+    This key is computed once on creation, so these fields
+    must not be changed afterwards.
     """
 
     editor_id: str | None
@@ -94,11 +100,30 @@ class PluginString:
     Status visible in Editor Tab.
     """
 
-    tree_item = None
+    tree_item: object = field(default=None, init=False, repr=False)
     """
     Tree Item in Editor Tab.
     """
 
+    key: tuple[str | None, str | None, int | None, str] = field(init=False, repr=False)
+    """
+    Identity of this string, precomputed for hashing and comparisons.
+    """
+
+    key_hash: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Types come from a small set of record and subrecord names
+        self.type = sys.intern(self.type)
+
+        self.key = (
+            self.form_id.lower() if self.form_id is not None else None,
+            self.editor_id,
+            self.index,
+            self.type,
+        )
+        self.key_hash = hash(self.key)
+
     @classmethod
     def from_string_data(cls, string_data: dict[str, str]) -> "PluginString":
         if "original" in string_data:
@@ -166,27 +191,174 @@ class PluginString:
             }
 
     def __hash__(self):
-        return hash((self.form_id.lower(), self.editor_id, self.index, self.type))
+        return self.key_hash
 
     def __eq__(self, __value: object) -> bool:
         if isinstance(__value, PluginString):
-            return hash(__value) == hash(self)
+            return self.key_hash == __value.key_hash and self.key == __value.key
 
         raise ValueError(
             f"Comparison between String and object of type {type(__value)} not possible!"
         )
 
-    def __getstate__(self):
-        state = self.__dict__.copy()
+    @staticmethod
+    def format_form_id(form_id: int, master: str) -> str:
+        """
+        Formats integer `form_id` and the plugin `master` that defines
+        the record as "<hex id>|<plugin>", for eg. "00012EB7|Skyrim.esm".
+        """
 
-        # Don't pickle tree_item
-        if self.tree_item:
-            del state["tree_item"]
+        return f"{form_id:08X}|{master}"
 
-        return state
+    @staticmethod
+    def split_form_id(form_id: str | None) -> tuple[int | None, str | None]:
+        """
+        Splits `form_id` of the format "<hex id>|<plugin>" into
+        the integer FormID and the plugin.
+
+        Returns None and `form_id` itself if it is not of that format.
+        """
+
+        if form_id is not None and "|" in form_id:
+            hex_id, master = form_id.split("|", 1)
+
+            try:
+                return int(hex_id, base=16), sys.intern(master)
+            except ValueError:
+                pass
+
+        return None, form_id
+
+    def __getstate__(self):
+        # Don't pickle tree_item and the key which is computed again
+        return (
+            self.editor_id,
+            self.form_id,
+            self.index,
+            self.type,
+            self.original_string,
+            self.translated_string,
+            self.status,
+        )
 
     def __setstate__(self, state):
-        self.__dict__.update(state)
+        (
+            self.editor_id,
+            self.form_id,
+            self.index,
+            self.type,
+            self.original_string,
+            self.translated_string,
+            self.status,
+        ) = state
 
         # Add tree_item back
         self.tree_item = None
+        self.__post_init__()
+
+
+class PluginStringBatch:
+    """
+    Columnar container for large amounts of strings.
+
+    The fields of the strings are stored in one list per field
+    and FormIDs are stored as integers with a separate list of masters.
+    This takes less memory than a list of `PluginString`s and is a lot faster
+    to pickle when the batch is passed between processes.
+    """
+
+    __slots__ = (
+        "editor_ids",
+        "form_ids",
+        "masters",
+        "indices",
+        "types",
+        "original_strings",
+        "translated_strings",
+        "statuses",
+    )
+
+    editor_ids: list[str | None]
+    form_ids: list[int | None]
+    masters: list[str | None]
+    """
+    Plugins that define the records of the strings.
+    Contains the complete FormID if it is not in the format of `format_form_id()`,
+    so that it is returned unchanged.
+    """
+
+    indices: list[int | None]
+    types: list[str]
+    original_strings: list[str]
+    translated_strings: list[str | None]
+    statuses: list[PluginString.Status | None]
+
+    def __init__(self, strings: Iterable[PluginString] = ()):
+        self.editor_ids = []
+        self.form_ids = []
+        self.masters = []
+        self.indices = []
+        self.types = []
+        self.original_strings = []
+        self.translated_strings = []
+        self.statuses = []
+
+        self.extend(strings)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __iter__(self) -> Iterator[PluginString]:
+        return map(self.__getitem__, range(len(self)))
+
+    def __getitem__(self, index: int) -> PluginString:
+        form_id = self.form_ids[index]
+        master = self.masters[index]
+
+        if form_id is not None:
+            form_id = PluginString.format_form_id(form_id, master)
+        else:
+            form_id = master
+
+        return PluginString(
+            self.editor_ids[index],
+            form_id,
+            self.indices[index],
+            self.types[index],
+            self.original_strings[index],
+            self.translated_strings[index],
+            self.statuses[index],
+        )
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in PluginStringBatch.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(PluginStringBatch.__slots__, state):
+            setattr(self, name, value)
+
+    def append(self, string: PluginString):
+        form_id, master = PluginString.split_form_id(string.form_id)
+
+        # Other spellings would be changed by formatting them again
+        if (
+            form_id is not None
+            and PluginString.format_form_id(form_id, master) != string.form_id
+        ):
+            form_id, master = None, string.form_id
+
+        self.editor_ids.append(string.editor_id)
+        self.form_ids.append(form_id)
+        self.masters.append(master)
+        self.indices.append(string.index)
+        self.types.append(string.type)
+        self.original_strings.append(string.original_string)
+        self.translated_strings.append(string.translated_string)
+        self.statuses.append(string.status)
+
+    def extend(self, strings: Iterable[PluginString]):
+        for string in strings:
+            self.append(string)
+
+    def to_string_data(self) -> list[dict[str, str]]:
+        return [string.to_string_data() for string in self]
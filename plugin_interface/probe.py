@@ -0,0 +1,203 @@
+"""
+Copyright (c) Cutleast
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from .codec import RECORD_HEADER
+from .flags import RecordFlags
+from .subrecord import HEDR, MAST, SUBRECORD_MAP, Subrecord
+from .utilities import BufferStream, get_type_code, peek
+
+
+@dataclass
+class PluginInfo:
+    """
+    Metadata of a plugin read from its header.
+    """
+
+    path: Path
+
+    flags: RecordFlags
+    """
+    Flags of the TES4 header record.
+    """
+
+    version: float
+    """
+    Version from HEDR subrecord.
+    """
+
+    records_num: int
+    """
+    Number of records and groups from HEDR subrecord.
+    """
+
+    next_object_id: int
+    """
+    Next available object id from HEDR subrecord.
+    """
+
+    masters: list[str] = field(default_factory=list)
+    """
+    Masters of the plugin in load order.
+    """
+
+    @property
+    def is_localized(self) -> bool:
+        """
+        Whether the strings of the plugin are stored in separate string tables.
+        """
+
+        return RecordFlags.Localized in self.flags
+
+    @property
+    def is_master(self) -> bool:
+        return RecordFlags.Master in self.flags
+
+    @property
+    def is_light(self) -> bool:
+        """
+        Whether the plugin is a light plugin, either indicated by
+        the file extension (.esl) or the light flag in the header.
+        """
+
+        return (
+            self.path.suffix.lower() == ".esl" or RecordFlags.LightMaster in self.flags
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        """
+        Whether the plugin does not contain any records besides its header.
+        """
+
+        return self.records_num == 0
+
+
+class PluginProbe:
+    """
+    Reads metadata of plugins from their headers without parsing the plugins.
+
+    Results are cached until the modification time or the size of a plugin changes.
+    """
+
+    PLUGIN_SUFFIXES = [".esp", ".esm", ".esl"]
+
+    cache: dict[Path, tuple[int, int, PluginInfo]]
+    """
+    Probed plugins by path with the modification time and size they had.
+    """
+
+    log = logging.getLogger("PluginInterface.Probe")
+
+    def __init__(self):
+        self.cache = {}
+
+    @staticmethod
+    def probe_file(plugin_path: Path) -> PluginInfo:
+        """
+        Reads the metadata of the plugin at `plugin_path` from its header record.
+        Only the header record is read from the file.
+        """
+
+        with plugin_path.open("rb") as stream:
+            header_data = stream.read(RECORD_HEADER.size)
+
+            if len(header_data) < RECORD_HEADER.size:
+                raise ValueError(f"{plugin_path.name!r} is not a valid plugin!")
+
+            type, size, flags, *_ = RECORD_HEADER.unpack(header_data)
+
+            if get_type_code(type) != "TES4":
+                raise ValueError(f"{plugin_path.name!r} is not a valid plugin!")
+
+            data = stream.read(size)
+
+        flags = RecordFlags.from_value(flags)
+        info = PluginInfo(plugin_path, flags, 0.0, 0, 0)
+
+        stream = BufferStream(data)
+        while peek(stream, 1):
+            subrecord_type = get_type_code(bytes(peek(stream, 4)))
+            subrecord: Subrecord = SUBRECORD_MAP.get(subrecord_type, Subrecord)()
+            subrecord.parse(stream, flags)
+
+            if isinstance(subrecord, HEDR):
+                info.version = subrecord.version
+                info.records_num = subrecord.records_num
+                info.next_object_id = subrecord.next_object_id
+
+            elif isinstance(subrecord, MAST):
+                info.masters.append(subrecord.file)
+
+        return info
+
+    def probe(self, plugin_path: Path) -> PluginInfo:
+        """
+        Returns the metadata of the plugin at `plugin_path`.
+        """
+
+        stat = plugin_path.stat()
+        key = plugin_path.resolve()
+
+        if cached := self.cache.get(key):
+            mtime, size, info = cached
+
+            if mtime == stat.st_mtime_ns and size == stat.st_size:
+                return info
+
+        info = PluginProbe.probe_file(plugin_path)
+        self.cache[key] = (stat.st_mtime_ns, stat.st_size, info)
+
+        return info
+
+    def probe_all(
+        self, plugin_paths: Iterable[Path], max_workers: int = None
+    ) -> dict[Path, PluginInfo]:
+        """
+        Probes `plugin_paths` concurrently in a thread pool.
+
+        Plugins that cannot be read are logged and left out of the result.
+        """
+
+        def probe(plugin_path: Path) -> PluginInfo | None:
+            try:
+                return self.probe(plugin_path)
+            except Exception as ex:
+                self.log.error(f"Failed to probe {str(plugin_path)!r}: {ex}")
+                return None
+
+        plugin_paths = list(plugin_paths)
+
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) * 4)
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            results = executor.map(probe, plugin_paths)
+
+            return {
+                plugin_path: info
+                for plugin_path, info in zip(plugin_paths, results)
+                if info is not None
+            }
+
+    def probe_directory(
+        self, directory: Path, max_workers: int = None
+    ) -> dict[Path, PluginInfo]:
+        """
+        Probes all plugins in `directory` concurrently.
+        """
+
+        plugin_paths = [
+            path
+            for path in directory.iterdir()
+            if path.suffix.lower() in PluginProbe.PLUGIN_SUFFIXES and path.is_file()
+        ]
+
+        return self.probe_all(plugin_paths, max_workers)
@@ -3,13 +3,38 @@ Copyright (c) Cutleast
 """
 
 import logging
+import weakref
 import zlib
-from io import BufferedReader, BytesIO
+from io import BufferedReader, BufferedWriter, BytesIO
+from typing import TYPE_CHECKING
 
-from .datatypes import Hex, Integer
+from .codec import RECORD_HEADER, UINT32
+from .datatypes import EncodingDetector
 from .flags import RecordFlags
-from .subrecord import SUBRECORD_MAP, StringSubrecord, Subrecord
-from .utilities import STRING_RECORDS, get_checksum, peek, prettyprint_object
+from .subrecord import StringSubrecord, Subrecord, get_subrecord_table
+from .utilities import (
+    BufferStream,
+    get_digest,
+    get_stream,
+    get_type_code,
+    is_string_record,
+    peek,
+    prettyprint_object,
+)
+
+if TYPE_CHECKING:
+    from .group import Group
+
+
+STRING_INDEX_VERSION = 3
+"""
+Version of the scheme for the indices of QUST strings,
+increased whenever the index of an existing string changes.
+
+1: From Python's `hash()` which is randomized per process.
+2: From a BLAKE2 digest which is stable across processes.
+3: The digest itself instead of the sum of its digits, which collided often.
+"""
 
 
 class Record:
@@ -17,63 +42,312 @@ class Record:
     Contains parsed record data.
     """
 
+    __slots__ = (
+        "type",
+        "size",
+        "flags",
+        "formid",
+        "timestamp",
+        "version_control_info",
+        "internal_version",
+        "unknown",
+        "header_flags",
+        "encodings",
+        "compressed_data",
+        "decompressed_size",
+        "__data",
+        "__subrecords",
+        "__payload",
+        "__payload_level",
+        "__length",
+        "__parent",
+        "source_offset",
+        "source_size",
+        "modified",
+        "__weakref__",
+    )
+
     type: str
     size: int
     flags: RecordFlags
-    formid: str
+    formid: int
     timestamp: int
     version_control_info: int
     internal_version: int
     unknown: int
-    data: bytes
+    header_flags: RecordFlags
+    encodings: EncodingDetector | None
 
-    subrecords: list[Subrecord]
+    compressed_data: bytes | memoryview | None
+    decompressed_size: int | None
+
+    __data: bytes | memoryview | None
+    __subrecords: list[Subrecord] | None
+
+    __payload: bytes | None
+    """
+    Serialized payload of a compressed record, kept from `__len__()`
+    until the record is written so that it is compressed only once.
+    """
+
+    __payload_level: int | None
+    """
+    zlib compression level `__payload` was compressed with.
+    """
+
+    __length: int | None
+    """
+    Cached size of this record including its header, reset when it is modified.
+    """
+
+    __parent: "weakref.ref[Group] | None"
+    """
+    Weak reference to the group containing this record.
+    """
+
+    source_offset: int | None
+    """
+    Offset of this record including its header in the buffer the plugin
+    was parsed from, only set if the plugin was parsed from a buffer.
+    """
+
+    source_size: int
+    """
+    Original size of this record including its header.
+    """
+
+    modified: bool
+    """
+    Whether this record was modified since it was parsed.
+    Unmodified records are copied from the buffer the plugin was parsed from
+    when they are written.
+    """
 
     log = logging.getLogger("PluginParser")
 
+    def __init__(self):
+        self.compressed_data = None
+        self.decompressed_size = None
+        self.__data = None
+        self.__subrecords = None
+        self.__payload = None
+        self.__payload_level = None
+        self.__length = None
+        self.__parent = None
+        self.source_offset = None
+        self.modified = False
+
     def __repr__(self) -> str:
         return prettyprint_object(self)
 
     def __len__(self):
-        return len(self.dump())
-
-    def parse(self, stream: BufferedReader, header_flags: RecordFlags):
-        self.type = stream.read(4).decode()
-        self.size = Integer.parse(stream, Integer.IntType.UInt32)
-        self.flags = RecordFlags.parse(stream, Integer.IntType.UInt32)
-        self.formid = Hex.parse(stream)
-        self.timestamp = Integer.parse(stream, Integer.IntType.UInt16)
-        self.version_control_info = Integer.parse(stream, Integer.IntType.UInt16)
-        self.internal_version = Integer.parse(stream, Integer.IntType.UInt16)
-        self.unknown = Integer.parse(stream, Integer.IntType.UInt16)
+        if not self.modified and self.source_offset is not None:
+            return self.source_size
+
+        if self.__length is None:
+            if not self.is_parsed and self.compressed_data is not None:
+                size = UINT32.size + len(self.compressed_data)
+            elif RecordFlags.Compressed not in self.flags:
+                if self.is_parsed:
+                    size = sum(map(len, self.subrecords))
+                else:
+                    size = len(self.data)
+            else:
+                # The size of compressed data is only known after compressing it,
+                # `compress()` has to be called before to use another level
+                self.__payload = self.get_payload()
+                self.__payload_level = zlib.Z_DEFAULT_COMPRESSION
+                size = len(self.__payload)
+
+            self.__length = RECORD_HEADER.size + size
+
+        return self.__length
+
+    @property
+    def parent(self) -> "Group | None":
+        """
+        Group containing this record.
+
+        Only a weak reference is kept so that groups and records do not form
+        reference cycles and are released as soon as the plugin releases them.
+        """
+
+        return self.__parent() if self.__parent is not None else None
+
+    @parent.setter
+    def parent(self, parent: "Group | None"):
+        self.__parent = weakref.ref(parent) if parent is not None else None
+
+    @property
+    def data(self) -> bytes | memoryview:
+        """
+        Uncompressed payload of this record.
+
+        Compressed payloads that were kept by lazy parsing
+        are decompressed on first access.
+        The payload is released once the subrecords are parsed from it.
+        """
+
+        if self.__data is None and self.compressed_data is not None:
+            self.__data = zlib.decompress(self.compressed_data)
+
+        return self.__data
+
+    @data.setter
+    def data(self, data: bytes | memoryview):
+        self.__data = data
+
+    @property
+    def subrecords(self) -> list[Subrecord]:
+        """
+        Subrecords (also known as fields) of this record.
+
+        They are parsed from `data` on first access if the record was parsed lazily.
+        """
+
+        if self.__subrecords is None:
+            self.parse_data()
+
+        return self.__subrecords
+
+    @subrecords.setter
+    def subrecords(self, subrecords: list[Subrecord]):
+        self.__subrecords = subrecords
+
+    @property
+    def is_parsed(self) -> bool:
+        """
+        Whether the subrecords of this record were already parsed.
+        """
+
+        return self.__subrecords is not None
+
+    @property
+    def has_strings(self) -> bool:
+        """
+        Whether records of this type can contain string subrecords.
+        """
+
+        return is_string_record(self.type)
+
+    def parse(
+        self,
+        stream: BufferedReader | BufferStream,
+        header_flags: RecordFlags,
+        lazy: bool = False,
+        encodings: EncodingDetector = None,
+    ):
+        """
+        Parses record from `stream`.
+
+        If `lazy` is True, only the header is parsed and the subrecords
+        are parsed from the payload the first time they are accessed.
+        Compressed payloads are also only decompressed when they are accessed
+        or by `decompress()`.
+
+        `encodings` is used to decode the strings of the record.
+        """
+
+        start = stream.tell()
+
+        (
+            type,
+            self.size,
+            flags,
+            formid,
+            self.timestamp,
+            self.version_control_info,
+            self.internal_version,
+            self.unknown,
+        ) = RECORD_HEADER.unpack(stream.read(RECORD_HEADER.size))
+        self.type = get_type_code(type)
+        self.flags = RecordFlags.from_value(flags)
+        self.formid = formid
+
+        self.compressed_data = None
+        self.data = None
 
         # Decompress data if compressed
         if RecordFlags.Compressed in self.flags:
-            decompressed_size = Integer.parse(stream, Integer.IntType.UInt32)
-            self.data = zlib.decompress(stream.read(self.size - 4))
-            self.size = decompressed_size
+            (self.decompressed_size,) = UINT32.unpack(stream.read(UINT32.size))
+            compressed_data = stream.read(self.size - 4)
+            self.size = self.decompressed_size
+
+            if lazy:
+                # Keep original payload to dump it unchanged if never touched
+                self.compressed_data = compressed_data
+            else:
+                self.data = zlib.decompress(compressed_data)
         else:
             self.data = stream.read(self.size)
 
-        # Parse subrecords (also known as fields)
+        self.header_flags = header_flags
+        self.encodings = encodings
+        self.__subrecords = None
+        self.__payload = None
+        self.__length = None
+
+        self.modified = False
+        if isinstance(stream, BufferStream):
+            self.source_offset = stream.offset + start
+            self.source_size = stream.tell() - start
+
+        if not lazy:
+            self.parse_data()
+
+    def mark_modified(self):
+        """
+        Marks this record and the groups containing it as modified,
+        so that they are serialized again when they are written.
+        """
+
+        self.modified = True
+        self.__payload = None
+        self.__length = None
+
+        parent = self.parent
+        if parent is not None:
+            parent.mark_modified()
+
+    def decompress(self):
+        """
+        Decompresses the compressed payload that was kept by lazy parsing.
+
+        `zlib` releases the GIL, so this can be called for many records
+        in a thread pool.
+        """
+
+        self.data = zlib.decompress(self.compressed_data)
+
+    def parse_data(self):
+        """
+        Parses subrecords (also known as fields) from `data`.
+        """
+
         match self.type:
             case "INFO":
-                self.parse_info_record(header_flags)
+                self.parse_info_record(self.header_flags)
             case "PERK":
-                self.parse_perk_record(header_flags)
+                self.parse_perk_record(self.header_flags)
             case "QUST":
-                self.parse_qust_record(header_flags)
+                self.parse_qust_record(self.header_flags)
             case _:
-                self.parse_subrecords(header_flags)
+                self.parse_subrecords(self.header_flags)
+
+        # The subrecords hold all data now
+        self.compressed_data = None
+        self.data = None
 
     def parse_qust_record(self, header_flags: RecordFlags):
-        stream = BytesIO(self.data)
+        data = self.data
+        stream = get_stream(data)
+        subrecord_table = get_subrecord_table(self.type)
         self.subrecords = []
 
         def calc_condition_index(stage_index: int) -> int:
             """
-            Creates unique index from hashes of previous array
-            of CTDA subrecords.
+            Creates unique index from the digest of the stage
+            and the previous array of CTDA subrecords.
             """
 
             ctda_subrecords: list[Subrecord] = []
@@ -84,33 +358,29 @@ class Record:
                 else:
                     break
 
-            hashes: list[int] = []
-
-            for subrecord in ctda_subrecords[::-1]:
-                value = abs(hash(subrecord.data))
-                hashes.append(value)
-
-            index = get_checksum(sum(hashes) - stage_index)
-
-            return index
+            return get_digest(
+                stage_index.to_bytes(8, byteorder="little"),
+                *(subrecord.data for subrecord in ctda_subrecords[::-1]),
+            )
 
         current_stage_index = 0
         current_objective_index = 0
 
-        while stream.tell() < len(self.data):
-            subrecord_type = peek(stream, 4).decode()
+        while (position := stream.tell()) < len(data):
+            subrecord_type = bytes(data[position : position + 4])
+            subrecord_class = subrecord_table.get(subrecord_type, Subrecord)
 
-            if subrecord_type in STRING_RECORDS.get(self.type, []):
-                subrecord = StringSubrecord(subrecord_type)
+            if subrecord_class is StringSubrecord:
+                subrecord = StringSubrecord(None, self.encodings, self)
             else:
-                subrecord: Subrecord = SUBRECORD_MAP.get(subrecord_type, Subrecord)()
+                subrecord: Subrecord = subrecord_class()
 
             subrecord.parse(stream, header_flags)
 
-            match subrecord_type:
+            match subrecord.type:
                 # Calculate stage "index" from INDX subrecord
                 case "INDX":
-                    current_stage_index = abs(hash(subrecord.data))
+                    current_stage_index = get_digest(subrecord.data)
 
                 # Set current log entry index as index of string
                 case "CNAM":
@@ -127,21 +397,24 @@ class Record:
             self.subrecords.append(subrecord)
 
     def parse_info_record(self, header_flags: RecordFlags):
-        stream = BytesIO(self.data)
+        data = self.data
+        stream = get_stream(data)
+        subrecord_table = get_subrecord_table(self.type)
         self.subrecords = []
         current_index = 0
 
-        while stream.tell() < len(self.data):
-            subrecord_type = peek(stream, 4).decode()
+        while (position := stream.tell()) < len(data):
+            subrecord_type = bytes(data[position : position + 4])
+            subrecord_class = subrecord_table.get(subrecord_type, Subrecord)
 
-            if subrecord_type in STRING_RECORDS.get(self.type, []):
-                subrecord = StringSubrecord(subrecord_type)
+            if subrecord_class is StringSubrecord:
+                subrecord = StringSubrecord(None, self.encodings, self)
             else:
-                subrecord: Subrecord = SUBRECORD_MAP.get(subrecord_type, Subrecord)()
+                subrecord: Subrecord = subrecord_class()
 
             subrecord.parse(stream, header_flags)
 
-            match subrecord_type:
+            match subrecord.type:
                 # Get response id
                 case "TRDT":
                     current_index = subrecord.response_id
@@ -153,26 +426,28 @@ class Record:
             self.subrecords.append(subrecord)
 
     def parse_perk_record(self, header_flags: RecordFlags):
-        stream = BytesIO(self.data)
+        data = self.data
+        stream = get_stream(data)
+        subrecord_table = get_subrecord_table(self.type)
         self.subrecords = []
 
         perk_type = None
         epfd_index = 0
 
-        while stream.tell() < len(self.data):
-            subrecord_type = peek(stream, 4).decode()
+        while (position := stream.tell()) < len(data):
+            subrecord_type = bytes(data[position : position + 4])
 
-            if (perk_type == 4 and subrecord_type == "EPF2") or (
-                perk_type == 7 and subrecord_type == "EPFD"
+            if (perk_type == 4 and subrecord_type == b"EPF2") or (
+                perk_type == 7 and subrecord_type == b"EPFD"
             ):
-                subrecord = StringSubrecord(subrecord_type)
+                subrecord = StringSubrecord(None, self.encodings, self)
             else:
-                subrecord: Subrecord = SUBRECORD_MAP.get(subrecord_type, Subrecord)()
+                subrecord: Subrecord = subrecord_table.get(subrecord_type, Subrecord)()
 
             subrecord.parse(stream, header_flags)
             self.subrecords.append(subrecord)
 
-            match subrecord_type:
+            match subrecord.type:
                 case "EPFT":
                     perk_type = subrecord.perk_type
 
@@ -192,21 +467,25 @@ class Record:
 
                     else:
                         self.log.warning(
-                            f"EPF2 Subrecord without following EPF3! Record: {self}"
+                            "EPF2 Subrecord without following EPF3! "
+                            f"Record: {self.type} {self.formid:08X}"
                         )
 
     def parse_subrecords(self, header_flags: RecordFlags):
-        stream = BytesIO(self.data)
+        data = self.data
+        stream = get_stream(data)
+        subrecord_table = get_subrecord_table(self.type)
         self.subrecords = []
         itxt_index = 0
 
-        while stream.tell() < len(self.data):
-            subrecord_type = peek(stream, 4).decode()
+        while (position := stream.tell()) < len(data):
+            subrecord_type = bytes(data[position : position + 4])
+            subrecord_class = subrecord_table.get(subrecord_type, Subrecord)
 
-            if subrecord_type in STRING_RECORDS.get(self.type, []):
-                subrecord = StringSubrecord(subrecord_type)
+            if subrecord_class is StringSubrecord:
+                subrecord = StringSubrecord(None, self.encodings, self)
             else:
-                subrecord: Subrecord = SUBRECORD_MAP.get(subrecord_type, Subrecord)()
+                subrecord: Subrecord = subrecord_class()
 
             subrecord.parse(stream, header_flags)
 
@@ -216,26 +495,110 @@ class Record:
 
             self.subrecords.append(subrecord)
 
-    def dump(self) -> bytes:
-        # Prepare Data field
-        data = b"".join(subrecord.dump() for subrecord in self.subrecords)
+    @property
+    def needs_compression(self) -> bool:
+        """
+        Whether the payload of this record has to be compressed again
+        when it is written.
+        """
+
+        if RecordFlags.Compressed not in self.flags:
+            return False
+
+        if not self.modified and self.source_offset is not None:
+            return False
+
+        return self.is_parsed
+
+    def compress(self, level: int = zlib.Z_DEFAULT_COMPRESSION):
+        """
+        Serializes and compresses the payload of this record with `level`
+        and keeps it until the record is written.
+
+        `zlib` releases the GIL, so this can be called for many records
+        in a thread pool.
+        """
+
+        if self.__payload is not None and self.__payload_level == level:
+            return
+
+        length = self.__length
+
+        self.__payload = self.get_payload(level)
+        self.__payload_level = level
+        self.__length = RECORD_HEADER.size + len(self.__payload)
+
+        # Sizes of the groups containing this record may be cached already
+        if self.__length != length and (parent := self.parent) is not None:
+            parent.mark_modified()
+
+    def get_payload(
+        self, level: int = zlib.Z_DEFAULT_COMPRESSION
+    ) -> bytes | memoryview:
+        """
+        Serializes the payload of this record as it is written after the header,
+        that is with the decompressed size prefixed if the record is compressed.
+
+        `level` is the zlib compression level used for compressed records.
+        """
+
+        # Prepare Data field, untouched lazy records are dumped from their payload
+        if self.is_parsed:
+            data = b"".join(subrecord.dump() for subrecord in self.subrecords)
+        elif self.compressed_data is not None:
+            # Re-emit untouched compressed payload without recompressing it
+            return UINT32.pack(self.decompressed_size) + self.compressed_data
+        else:
+            data = self.data
 
         if RecordFlags.Compressed in self.flags:
-            uncompressed_size = Integer.dump(len(data), Integer.IntType.UInt32)
-            data = uncompressed_size + zlib.compress(data)
-
-        self.size = len(data)
-
-        # Combine all values
-        self.data = b""
-        self.data += self.type.encode()
-        self.data += Integer.dump(self.size, Integer.IntType.UInt32)
-        self.data += RecordFlags.dump(self.flags, Integer.IntType.UInt32)
-        self.data += Hex.dump(self.formid)
-        self.data += Integer.dump(self.timestamp, Integer.IntType.UInt16)
-        self.data += Integer.dump(self.version_control_info, Integer.IntType.UInt16)
-        self.data += Integer.dump(self.internal_version, Integer.IntType.UInt16)
-        self.data += Integer.dump(self.unknown, Integer.IntType.UInt16)
-        self.data += data
-
-        return self.data
+            data = UINT32.pack(len(data)) + zlib.compress(data, level)
+
+        return data
+
+    def write(
+        self,
+        stream: BufferedWriter | BytesIO,
+        source: memoryview | None = None,
+        level: int = zlib.Z_DEFAULT_COMPRESSION,
+    ):
+        """
+        Writes this record to `stream`.
+
+        `source` is the buffer the plugin was parsed from, it is required
+        if the record was parsed from a buffer. Unmodified records are copied from it.
+        `level` is the zlib compression level used if the record is compressed.
+        """
+
+        if not self.modified and self.source_offset is not None:
+            end = self.source_offset + self.source_size
+            stream.write(source[self.source_offset : end])
+            return
+
+        payload = self.__payload
+        self.__payload = None
+
+        if payload is None or self.__payload_level != level:
+            payload = self.get_payload(level)
+
+        self.size = len(payload)
+
+        stream.write(
+            RECORD_HEADER.pack(
+                self.type.encode(),
+                self.size,
+                self.flags.value,
+                self.formid,
+                self.timestamp,
+                self.version_control_info,
+                self.internal_version,
+                self.unknown,
+            )
+        )
+        stream.write(payload)
+
+    def dump(self, source: memoryview | None = None) -> bytes:
+        stream = BytesIO()
+        self.write(stream, source)
+
+        return stream.getvalue()
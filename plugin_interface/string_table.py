@@ -0,0 +1,288 @@
+"""
+Copyright (c) Cutleast
+"""
+
+import logging
+import mmap
+import os
+from enum import Enum
+from pathlib import Path
+from typing import Iterator
+
+from .codec import STRING_TABLE_ENTRY, STRING_TABLE_HEADER, UINT32
+from .datatypes import EncodingDetector, RawString
+
+
+class StringTable:
+    """
+    String table (.STRINGS, .DLSTRINGS or .ILSTRINGS) of a localized plugin.
+
+    The file is memory-mapped and only its directory is read on load,
+    the strings themselves are decoded when they are requested.
+    """
+
+    class Type(Enum):
+        """
+        String table types by file extension.
+        """
+
+        Strings = ".strings"
+        """General strings, null-terminated."""
+
+        DLStrings = ".dlstrings"
+        """Descriptions and book texts, prefixed by their size."""
+
+        ILStrings = ".ilstrings"
+        """Dialogue lines, prefixed by their size."""
+
+    path: Path
+    type: Type
+
+    offsets: dict[int, int]
+    """
+    Offsets of the strings by their id, relative to the start of the string data.
+    """
+
+    data_offset: int
+    """
+    Offset of the string data in the file.
+    """
+
+    encodings: EncodingDetector
+    """
+    Encodings of the decoded strings.
+    """
+
+    __strings: dict[int, RawString]
+    __mapping: mmap.mmap = None
+
+    log = logging.getLogger("PluginInterface.StringTable")
+
+    def __init__(self, path: Path, type: Type = None):
+        self.path = path
+        self.type = type or StringTable.Type(path.suffix.lower())
+
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.offsets)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self.offsets
+
+    def __getitem__(self, id: int) -> RawString:
+        string = self.get(id)
+
+        if string is None:
+            raise KeyError(id)
+
+        return string
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def load(self):
+        """
+        Maps the file and reads the directory of string ids and offsets.
+        """
+
+        self.offsets = {}
+        self.data_offset = STRING_TABLE_HEADER.size
+        self.encodings = EncodingDetector()
+        self.__strings = {}
+
+        with self.path.open("rb") as file:
+            if not self.path.stat().st_size:
+                return
+
+            self.__mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        count, _ = STRING_TABLE_HEADER.unpack_from(self.__mapping)
+        self.data_offset = STRING_TABLE_HEADER.size + count * STRING_TABLE_ENTRY.size
+
+        directory = self.__mapping[STRING_TABLE_HEADER.size : self.data_offset]
+        self.offsets = dict(STRING_TABLE_ENTRY.iter_unpack(directory))
+
+    def get(self, id: int, default: RawString = None) -> RawString | None:
+        """
+        Returns the string with `id` or `default` if the table does not contain it.
+        """
+
+        if (string := self.__strings.get(id)) is not None:
+            return string
+
+        offset = self.offsets.get(id)
+
+        if offset is None:
+            return default
+
+        start = self.data_offset + offset
+
+        if self.type == StringTable.Type.Strings:
+            end = self.__mapping.find(b"\x00", start)
+        else:
+            (size,) = UINT32.unpack_from(self.__mapping, start)
+            start += UINT32.size
+            # The size includes the null terminator
+            end = start + max(size - 1, 0)
+
+        string = RawString.decode(self.__mapping[start:end], self.encodings)
+        self.__strings[id] = string
+
+        return string
+
+    @staticmethod
+    def write(
+        path: Path, strings: dict[int, str], type: Type = None, encoding: str = "utf8"
+    ):
+        """
+        Writes `strings` by their id to a string table at `path`,
+        encoded with `encoding`.
+
+        The directory and the string data are built in memory in a single pass
+        and written to a temporary file at once, which replaces the file at `path`
+        afterwards. Tables that are replaced must not be memory-mapped anymore.
+        """
+
+        type = type or StringTable.Type(path.suffix.lower())
+        has_size = type != StringTable.Type.Strings
+
+        directory = bytearray(len(strings) * STRING_TABLE_ENTRY.size)
+        data = bytearray()
+
+        for i, (id, string) in enumerate(strings.items()):
+            STRING_TABLE_ENTRY.pack_into(
+                directory, i * STRING_TABLE_ENTRY.size, id, len(data)
+            )
+
+            text = str.encode(string, encoding, errors="replace") + b"\x00"
+
+            if has_size:
+                data += UINT32.pack(len(text))
+
+            data += text
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + ".tmp")
+
+        with temp_path.open("wb") as file:
+            file.write(STRING_TABLE_HEADER.pack(len(strings), len(data)))
+            file.write(directory)
+            file.write(data)
+
+        os.replace(temp_path, path)
+
+    def close(self):
+        """
+        Releases the memory mapping.
+        """
+
+        self.__strings = {}
+
+        if self.__mapping is not None:
+            self.__mapping.close()
+            self.__mapping = None
+
+
+class StringTables:
+    """
+    String tables of a localized plugin for one language.
+
+    They are looked up in the "Strings" folder next to the plugin
+    and are named "<plugin name>_<language>.<type>", for eg. "Skyrim_English.STRINGS".
+    """
+
+    plugin_path: Path
+    language: str
+
+    tables: dict[StringTable.Type, StringTable]
+
+    log = logging.getLogger("PluginInterface.StringTables")
+
+    def __init__(self, plugin_path: Path, language: str = "english"):
+        self.plugin_path = plugin_path
+        self.language = language
+
+        self.tables = {
+            type: StringTable(path, type)
+            for type, path in StringTables.find_paths(plugin_path, language).items()
+        }
+
+        if not self.tables:
+            self.log.warning(
+                f"No {language} string tables found for {plugin_path.name!r}."
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def get_paths(
+        plugin_path: Path, language: str, folder: Path = None
+    ) -> dict[StringTable.Type, Path]:
+        """
+        Returns the paths for the string tables of `plugin_path` for `language`
+        in the "Strings" folder in `folder` (defaults to the folder of the plugin).
+        """
+
+        folder = (folder or plugin_path.parent) / "Strings"
+
+        return {
+            type: folder / f"{plugin_path.stem}_{language}{type.value.upper()}"
+            for type in StringTable.Type
+        }
+
+    @staticmethod
+    def find_paths(plugin_path: Path, language: str) -> dict[StringTable.Type, Path]:
+        """
+        Returns the paths of the existing string tables of `plugin_path`
+        for `language`. File and folder names are matched case-insensitively.
+        """
+
+        folder = next(
+            (
+                path
+                for path in plugin_path.parent.glob("*")
+                if path.name.lower() == "strings" and path.is_dir()
+            ),
+            None,
+        )
+
+        if folder is None:
+            return {}
+
+        files = {path.name.lower(): path for path in folder.iterdir()}
+        paths: dict[StringTable.Type, Path] = {}
+
+        for type in StringTable.Type:
+            name = f"{plugin_path.stem}_{language}{type.value}".lower()
+
+            if name in files:
+                paths[type] = files[name]
+
+        return paths
+
+    def get(self, id: int, default: RawString = None) -> RawString | None:
+        """
+        Returns the string with `id` from any of the tables
+        or `default` if none of them contains it.
+        """
+
+        for table in self.tables.values():
+            if (string := table.get(id)) is not None:
+                return string
+
+        return default
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
@@ -3,11 +3,24 @@ Copyright (c) Cutleast
 """
 
 import logging
-from io import BufferedReader, BytesIO
+import weakref
+from io import BufferedReader
+from typing import TYPE_CHECKING
 
-from .datatypes import Float, Hex, Integer, RawString
+from .codec import SUBRECORD_HEADER
+from .datatypes import EncodingDetector, Float, Integer, RawString
 from .flags import RecordFlags
-from .utilities import prettyprint_object
+from .utilities import (
+    STRING_RECORDS,
+    BufferStream,
+    get_attributes,
+    get_stream,
+    get_type_code,
+    prettyprint_object,
+)
+
+if TYPE_CHECKING:
+    from .record import Record
 
 
 class Subrecord:
@@ -15,12 +28,25 @@ class Subrecord:
     Contains parsed subrecord data.
     """
 
+    __slots__ = ("type", "size", "data", "index")
+
     type: str
     size: int
-    data: bytes
+    data: bytes | memoryview
+
+    index: int
+    """
+    String index in the record, only set for some subrecords.
+    """
 
     log = logging.getLogger("PluginParser.Subrecord")
 
+    COPY_THRESHOLD = 128
+    """
+    Size in bytes below which payloads read from a buffer are copied,
+    since a memoryview takes more memory than a small bytes object.
+    """
+
     def __init__(
         self,
         type: str = None,
@@ -31,22 +57,23 @@ class Subrecord:
         return prettyprint_object(self)
 
     def __str__(self):
-        return str(self.__dict__)
+        return str(get_attributes(self))
 
     def __len__(self):
-        return len(self.dump())
+        return SUBRECORD_HEADER.size + len(self.data)
 
-    def parse(self, stream: BufferedReader, header_flags: RecordFlags):
-        self.type = stream.read(4).decode()
-        self.size = Integer.parse(stream, Integer.IntType.UInt16)
+    def parse(self, stream: BufferedReader | BufferStream, header_flags: RecordFlags):
+        type, self.size = SUBRECORD_HEADER.unpack(stream.read(SUBRECORD_HEADER.size))
+        self.type = get_type_code(type)
         self.data = stream.read(self.size)
 
+        if isinstance(self.data, memoryview) and self.size < Subrecord.COPY_THRESHOLD:
+            self.data = bytes(self.data)
+
     def dump(self) -> bytes:
         self.size = len(self.data)
 
-        data = b""
-        data += self.type.encode()
-        data += Integer.dump(self.size, Integer.IntType.UInt16)
+        data = SUBRECORD_HEADER.pack(self.type.encode(), self.size)
         data += self.data
 
         return data
@@ -57,25 +84,27 @@ class HEDR(Subrecord):
     Class for HEDR subrecord.
     """
 
+    __slots__ = ("version", "records_num", "next_object_id")
+
     version: float
     records_num: int
-    next_object_id: str
+    next_object_id: int
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
         super().parse(stream, header_flags)
 
-        stream = BytesIO(self.data)
+        stream = get_stream(self.data)
 
         self.version = Float.parse(stream, Float.FloatType.Float32)
         self.records_num = Integer.parse(stream, Integer.IntType.UInt32)
-        self.next_object_id = Hex.parse(stream)
+        self.next_object_id = Integer.parse(stream, Integer.IntType.UInt32)
 
     def dump(self) -> bytes:
         self.data = b""
 
         self.data += Float.dump(self.version, Float.FloatType.Float32)
         self.data += Integer.dump(self.records_num, Integer.IntType.UInt32)
-        self.data += Hex.dump(self.next_object_id)
+        self.data += Integer.dump(self.next_object_id, Integer.IntType.UInt32)
 
         return super().dump()
 
@@ -85,6 +114,8 @@ class EDID(Subrecord):
     Class for EDID subrecord.
     """
 
+    __slots__ = ("editor_id",)
+
     editor_id: RawString
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
@@ -92,6 +123,9 @@ class EDID(Subrecord):
 
         self.editor_id = RawString.parse(self.data, RawString.StrType.ZString)
 
+    def __len__(self):
+        return SUBRECORD_HEADER.size + len(RawString.encode(self.editor_id)) + 1
+
     def dump(self) -> bytes:
         self.data = RawString.dump(self.editor_id, RawString.StrType.ZString)
 
@@ -103,11 +137,51 @@ class StringSubrecord(Subrecord):
     Class for string subrecords.
     """
 
+    __slots__ = ("string", "encodings", "__record", "__length")
+
     string: RawString | int
-    index: int = 0
+    encodings: EncodingDetector | None
+
+    __record: "weakref.ref[Record] | None"
+    """
+    Weak reference to the record containing this subrecord.
+    """
+
+    __length: int | None
+    """
+    Cached size of this subrecord including its header, reset when the string changes.
+    """
 
     log = logging.getLogger("PluginParser.StringSubrecord")
 
+    def __init__(
+        self,
+        type: str = None,
+        encodings: EncodingDetector = None,
+        record: "Record" = None,
+    ):
+        super().__init__(type)
+
+        self.index = 0
+        self.encodings = encodings
+        self.record = record
+        self.__length = None
+
+    @property
+    def record(self) -> "Record | None":
+        """
+        Record containing this subrecord, it is marked as modified when the string changes.
+
+        Only a weak reference is kept so that records and their subrecords
+        do not form reference cycles.
+        """
+
+        return self.__record() if self.__record is not None else None
+
+    @record.setter
+    def record(self, record: "Record | None"):
+        self.__record = weakref.ref(record) if record is not None else None
+
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
         super().parse(stream, header_flags)
 
@@ -116,13 +190,36 @@ class StringSubrecord(Subrecord):
 
         else:
             self.string = RawString.parse(
-                self.data, RawString.StrType.ZString, self.size
+                self.data, RawString.StrType.ZString, self.size, self.encodings
             )
 
+        # The raw data is created again from the string when dumping
+        self.data = None
+        self.__length = None
+
+    def __len__(self):
+        if self.__length is None:
+            if isinstance(self.string, int):
+                size = 4
+            else:
+                size = len(RawString.encode(self.string)) + 1
+
+            self.__length = SUBRECORD_HEADER.size + size
+
+        return self.__length
+
     def set_string(self, string: str):
+        if string == self.string:
+            return
+
         encoding = self.string.encoding
 
         self.string = RawString.from_str(string, encoding)
+        self.__length = None
+
+        record = self.record
+        if record is not None:
+            record.mark_modified()
 
     def dump(self) -> bytes:
         if isinstance(self.string, int):
@@ -139,6 +236,8 @@ class MAST(Subrecord):
     Class for MAST subrecord.
     """
 
+    __slots__ = ("file",)
+
     file: str
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
@@ -146,6 +245,9 @@ class MAST(Subrecord):
 
         self.file = RawString.parse(self.data, RawString.StrType.ZString)
 
+    def __len__(self):
+        return SUBRECORD_HEADER.size + len(RawString.encode(self.file)) + 1
+
     def dump(self) -> bytes:
         self.data = RawString.dump(self.file, RawString.StrType.ZString)
 
@@ -157,6 +259,8 @@ class XXXX(Subrecord):
     Class for special XXXX subrecord.
     """
 
+    __slots__ = ("field_size",)
+
     field_size: int
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
@@ -166,6 +270,9 @@ class XXXX(Subrecord):
         # Add header and data of following subrecord to this
         self.data = stream.read(self.field_size + 7)
 
+    def __len__(self):
+        return SUBRECORD_HEADER.size + self.size + len(self.data)
+
     def dump(self):
         data = b""
 
@@ -182,26 +289,37 @@ class TRDT(Subrecord):
     Class for TRDT subrecord.
     """
 
+    __slots__ = (
+        "emotion_type",
+        "emotion_value",
+        "unknown1",
+        "response_id",
+        "junk1",
+        "sound_file",
+        "use_emo_anim",
+        "junk2",
+    )
+
     emotion_type: int
     emotion_value: int
     unknown1: int
     response_id: int
     junk1: bytes
-    sound_file: str
+    sound_file: int
     use_emo_anim: int
     junk2: bytes
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
         super().parse(stream, header_flags)
 
-        stream = BytesIO(self.data)
+        stream = get_stream(self.data)
 
         self.emotion_type = Integer.parse(stream, Integer.IntType.UInt32)
         self.emotion_value = Integer.parse(stream, Integer.IntType.UInt32)
         self.unknown1 = Integer.parse(stream, Integer.IntType.Int32)
         self.response_id = Integer.parse(stream, Integer.IntType.UInt8)
         self.junk1 = stream.read(3)
-        self.sound_file = Hex.parse(stream)
+        self.sound_file = Integer.parse(stream, Integer.IntType.UInt32)
         self.use_emo_anim = Integer.parse(stream, Integer.IntType.UInt8)
         self.junk2 = stream.read(3)
 
@@ -213,7 +331,7 @@ class TRDT(Subrecord):
         self.data += Integer.dump(self.unknown1, Integer.IntType.Int32)
         self.data += Integer.dump(self.response_id, Integer.IntType.UInt8)
         self.data += self.junk1
-        self.data += Hex.dump(self.sound_file)
+        self.data += Integer.dump(self.sound_file, Integer.IntType.UInt32)
         self.data += Integer.dump(self.use_emo_anim, Integer.IntType.UInt8)
         self.data += self.junk2
 
@@ -225,6 +343,8 @@ class QOBJ(Subrecord):
     Class for QOBJ subrecord.
     """
 
+    __slots__ = ()
+
     index: int
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
@@ -243,6 +363,8 @@ class EPFT(Subrecord):
     Class for EPFT subrecord.
     """
 
+    __slots__ = ("perk_type",)
+
     perk_type: int
 
     def parse(self, stream: BufferedReader, header_flags: RecordFlags):
@@ -265,3 +387,30 @@ SUBRECORD_MAP: dict[str, type[Subrecord]] = {
     "EPFT": EPFT,
     "XXXX": XXXX,
 }
+
+SUBRECORD_TYPES: dict[bytes, type[Subrecord]] = {
+    type.encode(): subrecord_class for type, subrecord_class in SUBRECORD_MAP.items()
+}
+"""
+Subrecord classes by their raw type codes.
+"""
+
+SUBRECORD_TABLES: dict[str, dict[bytes, type[Subrecord]]] = {
+    record_type: SUBRECORD_TYPES
+    | {type.encode(): StringSubrecord for type in string_types}
+    for record_type, string_types in STRING_RECORDS.items()
+    # PERK records are special-cased in `Record.parse_perk_record`
+    if record_type != "PERK"
+}
+"""
+Subrecord classes by their raw type codes per record type,
+compiled once from the whitelist of string subrecords.
+"""
+
+
+def get_subrecord_table(record_type: str) -> dict[bytes, type[Subrecord]]:
+    """
+    Returns the subrecord classes by their raw type codes for records of type `record_type`.
+    """
+
+    return SUBRECORD_TABLES.get(record_type, SUBRECORD_TYPES)
@@ -2,17 +2,74 @@
 Copyright (c) Cutleast
 """
 
+import hashlib
+import sys
 from io import BufferedReader, BytesIO
 from pathlib import Path
 
 import jstyleson as json
 
+WHITELIST_NAME = "string_records.json"
+"""
+Name of the file that defines which records contain subrecords that are strings.
+"""
+
+
+def get_whitelist_path() -> Path:
+    """
+    Returns the path to the whitelist of string subrecords.
+
+    The whitelist is looked up in the package folder and next to it
+    before falling back to the current working directory.
+    """
+
+    package_path = Path(__file__).resolve().parent
+
+    for folder in (package_path, package_path.parent):
+        whitelist_path = folder / WHITELIST_NAME
+
+        if whitelist_path.is_file():
+            return whitelist_path
+
+    return Path.cwd() / WHITELIST_NAME
+
+
 # Load file that defines which records contain subrecords that are strings
-whitelist_path = Path("string_records.json")
-# whitelist_path = Path(__file__).parent / "string_records.json"
-whitelist_path = whitelist_path.resolve()
-with whitelist_path.open() as whitelist_file:
-    STRING_RECORDS: dict[str, list[str]] = json.load(whitelist_file)
+whitelist_path = get_whitelist_path()
+whitelist_data = whitelist_path.read_bytes()
+STRING_RECORDS: dict[str, list[str]] = json.loads(whitelist_data.decode())
+
+WHITELIST_DIGEST = hashlib.blake2b(whitelist_data, digest_size=16).hexdigest()
+"""
+Digest of the loaded whitelist, changes whenever the whitelist is edited.
+"""
+
+
+def is_string_record(record_type: str) -> bool:
+    """
+    Checks if records of type `record_type` can contain string subrecords.
+    """
+
+    # PERK records are special-cased in `Record.parse_perk_record`
+    return record_type in STRING_RECORDS or record_type == "PERK"
+
+
+TYPE_CODES: dict[bytes, str] = {}
+"""
+Cache for interned type codes of groups, records and subrecords.
+"""
+
+
+def get_type_code(data: bytes) -> str:
+    """
+    Returns the interned type code for the raw 4 bytes `data`.
+    """
+
+    try:
+        return TYPE_CODES[data]
+    except KeyError:
+        type_code = TYPE_CODES[data] = sys.intern(data.decode())
+        return type_code
 
 
 def peek(stream: BufferedReader, length: int):
@@ -22,11 +79,103 @@ def peek(stream: BufferedReader, length: int):
 
     data = stream.read(length)
 
-    stream.seek(-length, 1)
+    stream.seek(-len(data), 1)
 
     return data
 
 
+ZSTRING_CHUNK_SIZE = 4096
+"""
+Number of bytes that are scanned at once for the terminator of a null-terminated string.
+"""
+
+
+def read_zstring(stream: BufferedReader | BytesIO) -> bytes:
+    """
+    Reads a null-terminated string from `stream` and returns it without terminator.
+
+    The stream is scanned in chunks and positioned right after the terminator.
+    """
+
+    chunks: list[bytes] = []
+
+    while chunk := bytes(stream.read(ZSTRING_CHUNK_SIZE)):
+        end = chunk.find(b"\x00")
+
+        if end != -1:
+            chunks.append(chunk[:end])
+            stream.seek(end + 1 - len(chunk), 1)
+            break
+
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+
+class BufferStream:
+    """
+    Minimal read-only stream over a buffer.
+
+    Unlike `BytesIO`, `read()` returns `memoryview` slices of the underlying
+    buffer instead of copies, so nested groups, records and subrecords
+    can be parsed without duplicating the plugin data.
+    """
+
+    offset: int
+    """
+    Offset of the underlying buffer in the buffer the plugin is parsed from.
+    """
+
+    def __init__(self, data: bytes | memoryview, offset: int = 0):
+        self.view = memoryview(data).toreadonly()
+        self.pos = 0
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.view)
+
+    def read(self, size: int = -1) -> memoryview:
+        if size < 0:
+            data = self.view[self.pos :]
+        else:
+            data = self.view[self.pos : self.pos + size]
+
+        self.pos += len(data)
+
+        return data
+
+    def read_stream(self, size: int) -> "BufferStream":
+        """
+        Reads `size` bytes and returns a stream over them
+        that keeps their offset in the buffer the plugin is parsed from.
+        """
+
+        offset = self.offset + self.pos
+
+        return BufferStream(self.read(size), offset)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        match whence:
+            case 0:
+                self.pos = offset
+            case 1:
+                self.pos += offset
+            case 2:
+                self.pos = len(self.view) + offset
+
+        self.pos = max(0, min(self.pos, len(self.view)))
+
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
+
+
+STRING_FILTER_VERSION = 1
+"""
+Version of `is_valid_string()`, increased whenever it filters strings differently.
+"""
+
 CHAR_WHITELIST = [
     "\n",
     "\r",
@@ -58,6 +207,22 @@ def get_checksum(number: int):
     return sum(int(digit) for digit in str(number))
 
 
+def get_digest(*data: bytes | memoryview) -> int:
+    """
+    Returns a positive 63-bit digest of all buffers in `data`.
+
+    Unlike `hash()`, it does not change between processes
+    since bytes hashing is randomized per process.
+    """
+
+    digest = hashlib.blake2b(digest_size=8)
+
+    for buffer in data:
+        digest.update(buffer)
+
+    return int.from_bytes(digest.digest(), byteorder="little") >> 1
+
+
 def is_camel_case(text: str):
     """
     Checks if `text` is camel case without spaces.
@@ -98,19 +263,32 @@ def is_valid_string(text: str):
     return all(char.isprintable() or char in CHAR_WHITELIST for char in text)
 
 
-def get_stream(data: BufferedReader | bytes) -> BytesIO:
+def get_stream(
+    data: BufferedReader | BufferStream | bytes | memoryview,
+) -> BytesIO | BufferStream:
+    """
+    Returns a stream for `data`.
+
+    Buffers are wrapped in a `BufferStream` if they are memoryviews
+    so that parsing them does not copy their contents.
+    """
+
     if isinstance(data, bytes):
         return BytesIO(data)
+    elif isinstance(data, memoryview):
+        return BufferStream(data)
 
     return data
 
 
-def read_data(data: BufferedReader | bytes, size: int) -> bytes:
+def read_data(
+    data: BufferedReader | BufferStream | bytes | memoryview, size: int
+) -> bytes | memoryview:
     """
     Returns `size` bytes from `data`.
     """
 
-    if isinstance(data, bytes):
+    if isinstance(data, (bytes, memoryview)):
         return data[:size]
     else:
         return data.read(size)
@@ -129,11 +307,34 @@ def indent_text(text: str, indent: int = 4):
         return "\n".join(lines)
 
 
+def get_attributes(obj: object) -> dict[str, object]:
+    """
+    Returns all attributes of `obj` that are set, including those stored in slots.
+    """
+
+    attributes: dict[str, object] = {}
+
+    for cls in reversed(type(obj).__mro__):
+        for name in cls.__dict__.get("__slots__", ()):
+            # Private slot names are mangled
+            if name.startswith("__"):
+                name = f"_{cls.__name__}{name}"
+
+            try:
+                attributes[name] = getattr(obj, name)
+            except AttributeError:
+                pass
+
+    attributes.update(getattr(obj, "__dict__", {}))
+
+    return attributes
+
+
 def prettyprint_object(obj: object):
     text = "\r{\n"
     text += f"    class = {type(obj).__name__}\n"
 
-    for key, val in obj.__dict__.items():
+    for key, val in get_attributes(obj).items():
         if isinstance(val, list):
             if len(val) == 0:
                 text += indent_text(f"{key}: list = []\n")